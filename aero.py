@@ -1,6 +1,8 @@
+from functools import lru_cache
 import numpy as np
-import vtk
 import argparse
+import profiling
+from panels import aircraft_flow
 
 def generate_aircraft_model(resolution=60, wing_span=5, wing_width=0.1, length=10, height=1):
     """
@@ -28,77 +30,265 @@ def generate_aircraft_model(resolution=60, wing_span=5, wing_width=0.1, length=1
     x_wing, y_wing = np.meshgrid(x_wing, y_wing)
     z_wing = np.full_like(x_wing, length / 2).flatten()
 
-    x = np.concatenate([x_fuse, x_wing.flatten()])
-    y = np.concatenate([y_fuse, y_wing.flatten()])
-    z = np.concatenate([z_fuse, z_wing])
-    return x, y, z
+    # The coordinates are columns of one (n, 3) array so that VTK can use
+    # it as its points buffer without a copy.
+    points = np.empty((len(x_fuse) + x_wing.size, 3))
+    points[:, 0] = np.concatenate([x_fuse, x_wing.flatten()])
+    points[:, 1] = np.concatenate([y_fuse, y_wing.flatten()])
+    points[:, 2] = np.concatenate([z_fuse, z_wing])
+    return points[:, 0], points[:, 1], points[:, 2]
 
-def simulate_airflow_3d(x, y, z):
+def simulate_airflow_3d(x, y, z, flow=None, theta=0.5, **dimensions):
     """
-    Simulate 3D airflow around the aircraft model using a simple potential flow model.
+    Simulate 3D airflow around a body with a source-panel potential flow solver.
+    
+    The points only say where the flow is evaluated; the body it flows
+    around is `flow`, or the aircraft of panels.aircraft_flow(**dimensions)
+    when the dimensions of the model the points were generated with are given
+    instead. One of the two is required: the points alone do not say which
+    body they belong to. For any other shape pass its own solver, e.g.
+    panels.mesh_flow(vertices, triangles).
     
     Parameters:
-    x, y, z (array): Coordinates of the aircraft model.
+    x, y, z (array): Points where the airflow is evaluated, on or off the body.
+    flow (PanelSolver): Solved flow around the body.
+    theta (float): Barnes-Hut opening criterion, exact summation if 0.
+    dimensions: Keyword arguments of panels.aircraft_flow (wing_span,
+        wing_width, length, height, speed, and the panel resolution) used
+        when flow is omitted.
     
     Returns:
     tuple: Arrays of u, v, w components of the airflow vectors.
     """
-    u = -x / (x**2 + y**2 + z**2 + 0.1)
-    v = -y / (x**2 + y**2 + z**2 + 0.1)
-    w = -z / (x**2 + y**2 + z**2 + 0.1)
-    return u, v, w
+    if flow is None:
+        if not dimensions:
+            raise ValueError("simulate_airflow_3d needs the flow or the aircraft dimensions of the model")
+        flow = aircraft_flow(**dimensions)
+    elif dimensions:
+        raise ValueError("pass either flow or aircraft dimensions to simulate_airflow_3d, not both")
+    vectors = flow.velocity(interleave(x, y, z), theta)
+    return vectors[:, 0], vectors[:, 1], vectors[:, 2]
 
-def visualize_airflow_vtk_3d(x, y, z, u, v, w):
+def flow_domain(x, y, z, padding=0.25):
     """
-    Visualize the 3D airflow using VTK.
+    Box around the model's bounding box, grown by `padding` times its largest side on every side.
+    
+    Returns:
+    tuple: Lower and upper corners.
+    """
+    lower = np.array([x.min(), y.min(), z.min()])
+    upper = np.array([x.max(), y.max(), z.max()])
+    margin = padding * (upper - lower).max()
+    return lower - margin, upper + margin
+
+def query_grid(x, y, z, count, padding=0.25):
+    """
+    Regular lattice of count^3 points around the model's bounding box.
     
     Parameters:
     x, y, z (array): Coordinates of the aircraft model.
-    u, v, w (array): Components of the airflow vectors.
+    count (int): Points along each axis.
+    padding (float): Margin added on every side, as a fraction of the box size.
+    
+    Returns:
+    tuple: Arrays of x, y, z coordinates.
     """
-    points = vtk.vtkPoints()
-    vectors = vtk.vtkFloatArray()
-    vectors.SetNumberOfComponents(3)
-    vectors.SetName("Vectors")
+    lower, upper = flow_domain(x, y, z, padding)
+    axes = [np.linspace(low, high, count) for low, high in zip(lower, upper)]
+    points = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, 3)
+    return points[:, 0], points[:, 1], points[:, 2]
+
+class VelocityGrid:
+    """
+    Airflow sampled once on a regular lattice and trilinearly interpolated.
     
-    for xi, yi, zi, ui, vi, wi in zip(x, y, z, u, v, w):
-        points.InsertNextPoint(xi, yi, zi)
-        vectors.InsertNextTuple3(ui, vi, wi)
+    The panel solution is evaluated at count^3 lattice points with
+    simulate_airflow_3d; afterwards a velocity lookup is a handful of
+    vectorized gathers, cheap enough to call four times per RK4 step.
     
-    polydata = vtk.vtkPolyData()
-    polydata.SetPoints(points)
-    polydata.GetPointData().SetVectors(vectors)
+    Parameters:
+    lower, upper (array): Corners of the domain.
+    count (int): Lattice points along each axis.
+    flow (PanelSolver): Solved flow around the body.
+    theta (float): Barnes-Hut opening criterion used for the samples.
+    """
     
-    arrow = vtk.vtkArrowSource()
-    glyph = vtk.vtkGlyph3D()
-    glyph.SetSourceConnection(arrow.GetOutputPort())
-    glyph.SetInputData(polydata)
-    glyph.SetVectorModeToUseVector()
-    glyph.SetScaleModeToScaleByVector()
-    glyph.SetScaleFactor(0.1)
-    glyph.Update()
+    def __init__(self, lower, upper, count, flow, theta=0.5):
+        self.lower = np.asarray(lower, dtype=np.float64)
+        self.upper = np.asarray(upper, dtype=np.float64)
+        self.count = count
+        self.spacing = (self.upper - self.lower) / (count - 1)
+        axes = [np.linspace(low, high, count) for low, high in zip(self.lower, self.upper)]
+        points = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, 3)
+        u, v, w = simulate_airflow_3d(points[:, 0], points[:, 1], points[:, 2], flow, theta)
+        self.values = interleave(u, v, w)
+        self.corners = [(dx, dy, dz, (dx * count + dy) * count + dz) for dx in (0, 1) for dy in (0, 1) for dz in (0, 1)]
     
-    mapper = vtk.vtkPolyDataMapper()
-    mapper.SetInputConnection(glyph.GetOutputPort())
+    def contains(self, points):
+        return np.all((points >= self.lower) & (points <= self.upper), axis=1)
     
-    airflow_actor = vtk.vtkActor()
-    airflow_actor.SetMapper(mapper)
-    airflow_actor.GetProperty().SetColor(0, 0, 1)
+    def __call__(self, points):
+        scaled = np.clip((points - self.lower) / self.spacing, 0, self.count - 1)
+        cell = np.minimum(scaled.astype(np.intp), self.count - 2)
+        fraction = scaled - cell
+        weights = (1 - fraction, fraction)
+        base = (cell[:, 0] * self.count + cell[:, 1]) * self.count + cell[:, 2]
+        result = np.zeros((len(points), 3))
+        for dx, dy, dz, offset in self.corners:
+            weight = weights[dx][:, 0] * weights[dy][:, 1] * weights[dz][:, 2]
+            result += weight[:, None] * np.take(self.values, base + offset, axis=0)
+        return result
+
+@lru_cache(maxsize=4)
+def _sampled_grid(flow, lower, upper, count, theta):
+    return VelocityGrid(lower, upper, count, flow, theta)
+
+def velocity_grid(lower, upper, count, flow, theta=0.5):
+    """
+    VelocityGrid of a flow, sampled once per flow, domain and lattice size and shared afterwards.
+    
+    Reseeding or retracing around the same geometry then skips the lattice
+    sampling, which costs far more than a trace.
+    """
+    return _sampled_grid(flow, tuple(map(float, lower)), tuple(map(float, upper)), int(count), float(theta))
+
+def seed_particles(lower, upper, count):
+    """
+    Seed about `count` particles on a square grid across the upstream face (z = lower z) of the domain.
+    
+    Returns:
+    array: Seed positions of shape (side^2, 3).
+    """
+    side = max(1, int(round(np.sqrt(count))))
+    a, b = np.meshgrid(np.linspace(lower[0], upper[0], side + 2)[1:-1], np.linspace(lower[1], upper[1], side + 2)[1:-1])
+    return np.column_stack([a.ravel(), b.ravel(), np.full(a.size, lower[2])])
+
+def streamline_steps(seeds, velocity, step=None, max_steps=500, cells=2.0):
+    """
+    Advect particles through a velocity field one batched RK4 step at a time.
+    
+    All live particles advance together as one array per step, and a
+    particle is retired as soon as it leaves the velocity field's domain, so
+    every step only costs as much as the particles still in flight. A viewer
+    can draw the state after every step instead of waiting for the whole trace.
     
-    aircraft_points = vtk.vtkPoints()
-    for xi, yi, zi in zip(x, y, z):
-        aircraft_points.InsertNextPoint(xi, yi, zi)
+    Parameters:
+    seeds (array): Start positions of shape (n, 3).
+    velocity (VelocityGrid): Field to integrate through.
+    step (float): Fixed time step; if omitted every particle takes its own
+        step, long enough to cross about `cells` lattice cells along its
+        fastest axis.
+    max_steps (int): Maximum number of steps per particle.
+    cells (float): Lattice cells crossed per adaptive step.
+    
+    Yields:
+    tuple: Indices of the live particles, their positions and the flow speed there.
+    """
+    positions = np.asarray(seeds, dtype=np.float64)
+    alive = np.arange(len(positions))
+    k1 = velocity(positions)
+    for _ in range(max_steps):
+        yield alive, positions, np.linalg.norm(k1, axis=1)
+        if step is None:
+            # Slow particles take longer steps, fast ones shorter, so no
+            # particle skips over more than `cells` lattice cells.
+            dt = (cells / np.maximum(np.max(np.abs(k1) / velocity.spacing, axis=1), 1e-12))[:, None]
+        else:
+            dt = step
+        k2 = velocity(positions + 0.5 * dt * k1)
+        k3 = velocity(positions + 0.5 * dt * k2)
+        k4 = velocity(positions + dt * k3)
+        positions = positions + dt / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+        inside = velocity.contains(positions)
+        alive, positions = alive[inside], positions[inside]
+        if len(alive) == 0:
+            return
+        k1 = velocity(positions)
+    yield alive, positions, np.linalg.norm(k1, axis=1)
+
+def trace_streamlines(seeds, velocity, step=None, max_steps=500, cells=2.0):
+    """
+    Trace whole streamlines with streamline_steps.
+    
+    Tracing is bound by the four trilinear lookups per RK4 step: 10^5
+    particles crossing the default aircraft's domain take about 35 adaptive
+    steps and 2-3 s on one core, under 0.1 s per step. That is a batch cost;
+    the viewer instead draws the streamlines as they grow with GrowingStreamlines,
+    one step per frame.
+    
+    Parameters:
+    Same as streamline_steps.
+    
+    Returns:
+    tuple: Points of all streamlines, one after another (float32, shape (m, 3)),
+    offsets of each streamline into them (shape (n + 1,)) and the flow speed at every point.
+    """
+    owners, history, speeds = [], [], []
+    for alive, positions, speed in streamline_steps(seeds, velocity, step, max_steps, cells):
+        owners.append(alive)
+        history.append(positions.astype(np.float32))
+        speeds.append(speed.astype(np.float32))
+    
+    # Steps are recorded in order, so a stable sort by particle gives every
+    # streamline's points consecutively and in time order.
+    owners = np.concatenate(owners)
+    order = np.argsort(owners, kind='stable')
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(owners, minlength=len(seeds)))])
+    return np.concatenate(history)[order], offsets, np.concatenate(speeds)[order]
+
+def interleave(a, b, c):
+    """
+    Return an (n, 3) array with columns a, b and c.
+
+    When the three arrays already are consecutive columns of one C-ordered
+    (n, 3) array, that array is returned as is; otherwise the columns are
+    stacked in one vectorized copy.
+    """
+    base = a.base
+    if (isinstance(base, np.ndarray) and base is b.base and base is c.base and base.ndim == 2
+            and base.shape == (len(a), 3) and base.flags.c_contiguous
+            and [array.__array_interface__['data'][0] for array in (a, b, c)]
+            == [base.__array_interface__['data'][0] + k * base.itemsize for k in range(3)]):
+        return base
+    return np.column_stack((a, b, c))
+
+def vtk_points(x, y, z):
+    """Wrap coordinates as vtkPoints without copying them, see interleave."""
+    import vtk
+    from vtk.util import numpy_support
+    points = vtk.vtkPoints()
+    points.SetData(numpy_support.numpy_to_vtk(interleave(x, y, z), deep=False))
+    return points
+
+def aircraft_actor(points):
+    """Red point cloud actor drawing every point of a vtkPoints."""
+    import vtk
+    from vtk.util import numpy_support
+    num_points = points.GetNumberOfPoints()
+    verts = vtk.vtkCellArray()
+    verts.SetData(numpy_support.numpy_to_vtkIdTypeArray(np.arange(num_points + 1, dtype=np.int64), deep=False),
+                  numpy_support.numpy_to_vtkIdTypeArray(np.arange(num_points, dtype=np.int64), deep=False))
     
     aircraft_polydata = vtk.vtkPolyData()
-    aircraft_polydata.SetPoints(aircraft_points)
+    aircraft_polydata.SetPoints(points)
+    aircraft_polydata.SetVerts(verts)
     
     aircraft_mapper = vtk.vtkPolyDataMapper()
     aircraft_mapper.SetInputData(aircraft_polydata)
     
-    aircraft_actor = vtk.vtkActor()
-    aircraft_actor.SetMapper(aircraft_mapper)
-    aircraft_actor.GetProperty().SetColor(1, 0, 0)
+    actor = vtk.vtkActor()
+    actor.SetMapper(aircraft_mapper)
+    actor.GetProperty().SetColor(1, 0, 0)
+    return actor
+
+def show_actors(actors, show=True, tick=None, interval=30):
+    """
+    Put actors in a white-background window and, if `show`, render it and start interacting.
     
+    With `tick`, a repeating timer calls it every `interval` milliseconds
+    while the window is open and renders the result, until it returns False.
+    """
+    import vtk
     renderer = vtk.vtkRenderer()
     render_window = vtk.vtkRenderWindow()
     render_window.AddRenderer(renderer)
@@ -106,12 +296,192 @@ def visualize_airflow_vtk_3d(x, y, z, u, v, w):
     render_interactor = vtk.vtkRenderWindowInteractor()
     render_interactor.SetRenderWindow(render_window)
     
-    renderer.AddActor(airflow_actor)
-    renderer.AddActor(aircraft_actor)
+    for actor in actors:
+        renderer.AddActor(actor)
     renderer.SetBackground(1, 1, 1)
     
-    render_window.Render()
-    render_interactor.Start()
+    if show:
+        if tick is not None:
+            render_interactor.Initialize()
+            timer = []
+            
+            def on_timer(interactor, event):
+                if not tick():
+                    interactor.DestroyTimer(timer[0])
+                render_window.Render()
+            
+            render_interactor.AddObserver('TimerEvent', on_timer)
+            timer.append(render_interactor.CreateRepeatingTimer(interval))
+        with profiling.stage('first_render'):
+            render_window.Render()
+        render_interactor.Start()
+    return render_window
+
+def airflow_actors(x, y, z, u, v, w, model=None):
+    """
+    Arrow glyphs of the airflow and the aircraft point cloud, without a window.
+    
+    Parameters:
+    x, y, z (array): Points the airflow vectors are drawn at.
+    u, v, w (array): Components of the airflow vectors.
+    model (tuple): x, y, z of the aircraft model if the vectors are not drawn on it.
+    
+    Returns:
+    list: Airflow and aircraft actors, with the glyphs already computed.
+    """
+    import vtk
+    from vtk.util import numpy_support
+    # VTK wraps the NumPy buffers directly; the arrays keep a reference to
+    # them, and one vtkPoints is shared by the glyph input and the aircraft
+    # unless a separate model is given.
+    points = vtk_points(x, y, z)
+    vectors = numpy_support.numpy_to_vtk(interleave(u, v, w), deep=False)
+    vectors.SetName("Vectors")
+    
+    polydata = vtk.vtkPolyData()
+    polydata.SetPoints(points)
+    polydata.GetPointData().SetVectors(vectors)
+    
+    with profiling.stage('glyph_setup'):
+        arrow = vtk.vtkArrowSource()
+        glyph = vtk.vtkGlyph3D()
+        glyph.SetSourceConnection(arrow.GetOutputPort())
+        glyph.SetInputData(polydata)
+        glyph.SetVectorModeToUseVector()
+        glyph.SetScaleModeToScaleByVector()
+        glyph.SetScaleFactor(0.1)
+        glyph.Update()
+        
+        mapper = vtk.vtkPolyDataMapper()
+        mapper.SetInputConnection(glyph.GetOutputPort())
+    
+    airflow_actor = vtk.vtkActor()
+    airflow_actor.SetMapper(mapper)
+    airflow_actor.GetProperty().SetColor(0, 0, 1)
+    
+    model_points = points if model is None else vtk_points(*model)
+    return [airflow_actor, aircraft_actor(model_points)]
+
+def visualize_airflow_vtk_3d(x, y, z, u, v, w, show=True, model=None):
+    """
+    Visualize the 3D airflow using VTK.
+    
+    Parameters:
+    Same as airflow_actors, and
+    show (bool): Open the window; if False the scene is only built.
+    
+    Returns:
+    vtkRenderWindow: Window holding the scene.
+    """
+    return show_actors(airflow_actors(x, y, z, u, v, w, model), show)
+
+def visualize_streamlines_vtk_3d(x, y, z, points, offsets, speeds, show=True):
+    """
+    Visualize streamlines as one polyline dataset colored by flow speed.
+    
+    Parameters:
+    x, y, z (array): Coordinates of the aircraft model.
+    points, offsets, speeds (array): Streamlines as returned by trace_streamlines.
+    show (bool): Open the window; if False the scene is only built.
+    
+    Returns:
+    vtkRenderWindow: Window holding the scene.
+    """
+    import vtk
+    from vtk.util import numpy_support
+    line_points = vtk.vtkPoints()
+    line_points.SetData(numpy_support.numpy_to_vtk(points, deep=False))
+    lines = vtk.vtkCellArray()
+    lines.SetData(numpy_support.numpy_to_vtkIdTypeArray(offsets.astype(np.int64), deep=False),
+                  numpy_support.numpy_to_vtkIdTypeArray(np.arange(len(points), dtype=np.int64), deep=False))
+    speed_array = numpy_support.numpy_to_vtk(speeds, deep=False)
+    speed_array.SetName("Speed")
+    
+    polydata = vtk.vtkPolyData()
+    polydata.SetPoints(line_points)
+    polydata.SetLines(lines)
+    polydata.GetPointData().SetScalars(speed_array)
+    
+    mapper = vtk.vtkPolyDataMapper()
+    mapper.SetInputData(polydata)
+    mapper.SetScalarRange(float(speeds.min()), float(speeds.max()))
+    
+    streamline_actor = vtk.vtkActor()
+    streamline_actor.SetMapper(mapper)
+    return show_actors([streamline_actor, aircraft_actor(vtk_points(x, y, z))], show)
+
+class GrowingStreamlines:
+    """
+    Streamlines drawn while streamline_steps advances them, one step per call.
+    
+    Every step appends the particles' new positions and one line segment per
+    live particle, from its previous point, to a single polyline dataset and
+    marks it modified, so a render after each call shows the streamlines as
+    far as they are traced. Point and segment buffers grow by doubling and are
+    handed to VTK without copies, so a step costs only as much as the
+    particles still in flight.
+    
+    Parameters:
+    Same as streamline_steps.
+    """
+    
+    def __init__(self, seeds, velocity, step=None, max_steps=500, cells=2.0):
+        import vtk
+        self.steps = streamline_steps(seeds, velocity, step, max_steps, cells)
+        self.points = np.empty((2 * len(seeds), 3), dtype=np.float32)
+        self.speeds = np.empty(len(self.points), dtype=np.float32)
+        self.segments = np.empty(2 * len(self.points), dtype=np.int64)
+        self.num_points = 0
+        self.num_segments = 0
+        self.last = None
+        self.polydata = vtk.vtkPolyData()
+        self.polydata.SetPoints(vtk.vtkPoints())
+        self.polydata.SetLines(vtk.vtkCellArray())
+        self.mapper = vtk.vtkPolyDataMapper()
+        self.mapper.SetInputData(self.polydata)
+        self.actor = vtk.vtkActor()
+        self.actor.SetMapper(self.mapper)
+        self.advance()
+    
+    def advance(self):
+        """
+        Trace one more step and append it to the polydata.
+        
+        Returns:
+        bool: False once every streamline has ended.
+        """
+        from vtk.util import numpy_support
+        try:
+            alive, positions, speed = next(self.steps)
+        except StopIteration:
+            return False
+        start, end = self.num_points, self.num_points + len(alive)
+        if end > len(self.points):
+            self.points = np.concatenate([self.points[:start], np.empty((end, 3), dtype=np.float32)])
+            self.speeds = np.concatenate([self.speeds[:start], np.empty(end, dtype=np.float32)])
+        self.points[start:end] = positions
+        self.speeds[start:end] = speed
+        self.num_points = end
+        indices = np.arange(start, end)
+        if self.last is None:
+            self.last = np.empty(alive.max() + 1 if len(alive) else 0, dtype=np.int64)
+        else:
+            count = 2 * self.num_segments
+            if count + 2 * len(alive) > len(self.segments):
+                self.segments = np.concatenate([self.segments[:count], np.empty(count + 2 * len(alive), dtype=np.int64)])
+            self.segments[count:count + 2 * len(alive):2] = self.last[alive]
+            self.segments[count + 1:count + 2 * len(alive):2] = indices
+            self.num_segments += len(alive)
+        self.last[alive] = indices
+        
+        speeds = numpy_support.numpy_to_vtk(self.speeds[:end], deep=False)
+        speeds.SetName("Speed")
+        self.polydata.GetPoints().SetData(numpy_support.numpy_to_vtk(self.points[:end], deep=False))
+        self.polydata.GetLines().SetData(2, numpy_support.numpy_to_vtkIdTypeArray(self.segments[:2 * self.num_segments], deep=False))
+        self.polydata.GetPointData().SetScalars(speeds)
+        self.polydata.Modified()
+        self.mapper.SetScalarRange(float(self.speeds[:end].min()), float(self.speeds[:end].max()))
+        return True
 
 def main():
     parser = argparse.ArgumentParser(description="Aircraft airflow simulation and visualization.")
@@ -120,11 +490,40 @@ def main():
     parser.add_argument('--wing_width', type=float, default=0.1, help='Width of the wings.')
     parser.add_argument('--length', type=float, default=10, help='Length of the fuselage.')
     parser.add_argument('--height', type=float, default=1, help='Height of the fuselage.')
+    parser.add_argument('--panel_resolution', type=int, default=60, help='Resolution of the panels the flow is solved on.')
+    parser.add_argument('--speed', type=float, default=1.0, help='Onset flow speed along the fuselage, nose to tail.')
+    parser.add_argument('--grid', type=int, default=None, help='Evaluate the flow on a GRID^3 lattice around the aircraft instead of on its surface.')
+    parser.add_argument('--streamlines', type=int, default=None, help='Draw streamlines of about this many particles instead of arrows.')
+    parser.add_argument('--steps', type=int, default=500, help='Maximum RK4 steps per streamline.')
+    parser.add_argument('--theta', type=float, default=0.5, help='Barnes-Hut opening criterion, 0 for exact summation.')
+    parser.add_argument('--profile', nargs='?', const='profile.json', default=None, metavar='JSON', help='Time every stage and write a JSON report.')
     args = parser.parse_args()
+    if args.profile:
+        profiling.enable(output=args.profile)
     
-    x, y, z = generate_aircraft_model(args.resolution, args.wing_span, args.wing_width, args.length, args.height)
-    u, v, w = simulate_airflow_3d(x, y, z)
-    visualize_airflow_vtk_3d(x, y, z, u, v, w)
+    with profiling.stage('generate_aircraft_model'):
+        x, y, z = generate_aircraft_model(args.resolution, args.wing_span, args.wing_width, args.length, args.height)
+    with profiling.stage('panel_solve'):
+        flow = aircraft_flow(args.panel_resolution, args.wing_span, args.wing_width, args.length, args.height, args.speed)
+    if args.streamlines:
+        lower, upper = flow_domain(x, y, z)
+        with profiling.stage('simulate_airflow_3d'):
+            velocity = velocity_grid(lower, upper, args.grid or 64, flow, args.theta)
+        # The streamlines are traced while the window is open, one step per
+        # frame, rather than all at once before it appears.
+        with profiling.stage('visualize_streamlines_vtk_3d'):
+            streamlines = GrowingStreamlines(seed_particles(lower, upper, args.streamlines), velocity,
+                                             max_steps=args.steps)
+            show_actors([streamlines.actor, aircraft_actor(vtk_points(x, y, z))], tick=streamlines.advance)
+        return
+    model = None
+    if args.grid:
+        model = (x, y, z)
+        x, y, z = query_grid(x, y, z, args.grid)
+    with profiling.stage('simulate_airflow_3d'):
+        u, v, w = simulate_airflow_3d(x, y, z, flow, args.theta)
+    with profiling.stage('visualize_airflow_vtk_3d'):
+        visualize_airflow_vtk_3d(x, y, z, u, v, w, model=model)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,255 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+import aero
+from panels import aircraft_flow
+from simulation import ScatteringSimulation
+
+# Problem sizes per preset: radar rays drawn, rays sampled for the
+# ground-hit estimate, fuselage resolution of the airflow model and
+# streamline particles.
+SIZES = {
+    'small': {'num_points': 1000, 'samples': 10 ** 4, 'resolution': 60, 'particles': 1000},
+    'medium': {'num_points': 10 ** 4, 'samples': 10 ** 5, 'resolution': 240, 'particles': 10 ** 4},
+    'large': {'num_points': 10 ** 5, 'samples': 10 ** 6, 'resolution': 960, 'particles': 10 ** 5},
+}
+
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+
+# Modules a batch worker imports, and the GUI and rendering packages that
+# importing them must not pull in.
+COMPUTE_MODULES = ('simulation', 'design', 'store', 'aero')
+GUI_MODULES = ('vtk', 'tkinter')
+
+
+def _airflow_model(context, resolution):
+    key = ('model', resolution)
+    if key not in context:
+        x, y, z = aero.generate_aircraft_model(resolution)
+        context[key] = (x, y, z) + aero.simulate_airflow_3d(x, y, z, aircraft_flow())
+    return context[key]
+
+
+def _simulation(context, num_points):
+    """A simulation whose rays are traced and reflected, shared by the stages that only read it."""
+    key = ('simulation', num_points)
+    if key not in context:
+        context[key] = ScatteringSimulation('aircraft', 1.0, 1e10, num_points, seed=0)
+        context[key].run()
+    return context[key]
+
+
+def bench_trace_incoming_rays(params, context):
+    simulation = ScatteringSimulation('aircraft', 1.0, 1e10, params['num_points'], seed=0)
+    simulation.build_geometry()
+
+    def run():
+        # A fresh batch every time, so sampling is timed too.
+        simulation.unit_origins = simulation.unit_targets = np.empty((0, 3))
+        simulation.sample_rays()
+        simulation.trace_incoming_rays()
+
+    return run, params['num_points'], 'rays'
+
+
+def bench_compute_scattered_rays(params, context):
+    simulation = _simulation(context, params['num_points'])
+    return simulation.compute_scattered_rays, params['num_points'], 'rays'
+
+
+def bench_create_incoming_waves(params, context):
+    # At most MAX_DISPLAYED_RAYS rays are drawn, so only those count as work.
+    from index import incoming_segments, lines_polydata
+    simulation = _simulation(context, params['num_points'])
+    return lambda: lines_polydata(*incoming_segments(simulation)), len(incoming_segments(simulation)[0]), 'rays'
+
+
+def bench_create_scattered_waves(params, context):
+    from index import lines_polydata, scattered_segments
+    simulation = _simulation(context, params['num_points'])
+    return lambda: lines_polydata(*scattered_segments(simulation)), len(scattered_segments(simulation)[0]), 'rays'
+
+
+def bench_calculate_reflection_percentage(params, context):
+    simulation = _simulation(context, SIZES['small']['num_points'])
+    samples = params['samples']
+    return lambda: simulation.ground_hit_percentage(None, max_samples=samples), samples, 'rays'
+
+
+def bench_generate_aircraft_model(params, context):
+    resolution = params['resolution']
+    x, _, _ = aero.generate_aircraft_model(resolution)
+    return lambda: aero.generate_aircraft_model(resolution), len(x), 'points'
+
+
+def bench_simulate_airflow_3d(params, context):
+    x, y, z = _airflow_model(context, params['resolution'])[:3]
+    flow = aircraft_flow()
+    return lambda: aero.simulate_airflow_3d(x, y, z, flow), len(x), 'points'
+
+
+def bench_visualize_airflow_vtk_3d(params, context):
+    model = _airflow_model(context, params['resolution'])
+    return lambda: aero.airflow_actors(*model), len(model[0]), 'points'
+
+
+def bench_trace_streamlines(params, context):
+    if 'velocity' not in context:
+        x, y, z = aero.generate_aircraft_model()
+        context['velocity'] = aero.velocity_grid(*aero.flow_domain(x, y, z), 64, aircraft_flow())
+    velocity = context['velocity']
+    seeds = aero.seed_particles(velocity.lower, velocity.upper, params['particles'])
+    return lambda: aero.trace_streamlines(seeds, velocity), len(seeds), 'particles'
+
+
+def bench_import_compute_modules(params, context):
+    """Cold start of a worker: import the compute modules in a fresh interpreter."""
+    code = (f"import sys; import {', '.join(COMPUTE_MODULES)}; "
+            f"print(' '.join(name for name in {GUI_MODULES!r} if name in sys.modules))")
+    directory = os.path.dirname(os.path.abspath(__file__))
+
+    def run():
+        loaded = subprocess.run([sys.executable, '-c', code], cwd=directory, capture_output=True, text=True,
+                                check=True).stdout.split()
+        if loaded:
+            raise RuntimeError(f"Importing {', '.join(COMPUTE_MODULES)} loaded {', '.join(loaded)}")
+
+    return run, len(COMPUTE_MODULES), 'modules'
+
+
+STAGES = {
+    'import_compute_modules': bench_import_compute_modules,
+    'trace_incoming_rays': bench_trace_incoming_rays,
+    'compute_scattered_rays': bench_compute_scattered_rays,
+    'create_incoming_waves': bench_create_incoming_waves,
+    'create_scattered_waves': bench_create_scattered_waves,
+    'calculate_reflection_percentage': bench_calculate_reflection_percentage,
+    'generate_aircraft_model': bench_generate_aircraft_model,
+    'simulate_airflow_3d': bench_simulate_airflow_3d,
+    'visualize_airflow_vtk_3d': bench_visualize_airflow_vtk_3d,
+    'trace_streamlines': bench_trace_streamlines,
+}
+
+
+def measure(run, repeat=3):
+    """
+    Time a stage and record its peak memory.
+
+    The wall time is the best of `repeat` runs. Peak memory comes from one
+    extra run under tracemalloc, which sees Python and NumPy allocations but
+    not memory allocated inside VTK.
+
+    Returns:
+    tuple: Wall time in seconds and peak traced memory in bytes.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(times), peak
+
+
+def run_benchmarks(stages=None, sizes=('small',), repeat=3):
+    """
+    Run the selected stages at the selected problem sizes.
+
+    Returns:
+    dict: Results keyed by 'stage[size]', each with the problem size, wall
+    time, peak memory and throughput in work units per second.
+    """
+    context = {}
+    results = {}
+    for size in sizes:
+        params = SIZES[size]
+        for name in stages or STAGES:
+            run, work, unit = STAGES[name](params, context)
+            wall_time, peak = measure(run, repeat)
+            results[f'{name}[{size}]'] = {
+                'work': work,
+                'unit': unit,
+                'wall_time': wall_time,
+                'peak_memory': peak,
+                'throughput': work / wall_time if wall_time > 0 else float('inf'),
+            }
+    return results
+
+
+def compare(results, baseline, threshold=0.2):
+    """
+    Regressions of `results` against a baseline.
+
+    A benchmark regresses when its wall time or peak memory exceeds the
+    baseline value by more than `threshold` (a fraction).
+
+    Returns:
+    list: (benchmark, metric, baseline value, new value) for every regression.
+    """
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        for metric in ('wall_time', 'peak_memory'):
+            if result[metric] > reference[metric] * (1 + threshold):
+                regressions.append((key, metric, reference[metric], result[metric]))
+    return regressions
+
+
+def save_baseline(path, results):
+    payload = {'python': platform.python_version(), 'machine': platform.machine(),
+               'numpy': np.__version__, 'results': results}
+    with open(path, 'w') as handle:
+        json.dump(payload, handle, indent=2, sort_keys=True)
+
+
+def load_baseline(path):
+    with open(path) as handle:
+        return json.load(handle)['results']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmarks of the simulation and airflow stages.")
+    parser.add_argument('--stage', nargs='+', choices=list(STAGES), default=None, help='Stages to run, all by default.')
+    parser.add_argument('--size', nargs='+', choices=list(SIZES), default=['small'], help='Problem size presets.')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per benchmark; the best one is kept.')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline JSON file to compare against or write.')
+    parser.add_argument('--save', action='store_true', help='Write the results as the new baseline.')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed slowdown or memory growth as a fraction.')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.stage, args.size, args.repeat)
+    for key, result in results.items():
+        print(f"{key:45s} {result['wall_time'] * 1e3:10.2f} ms {result['peak_memory'] / 2 ** 20:9.2f} MiB "
+              f"{result['throughput']:14.0f} {result['unit']}/s")
+
+    if args.save:
+        save_baseline(args.baseline, results)
+        print(f"Baseline written to {args.baseline}")
+        return
+    try:
+        baseline = load_baseline(args.baseline)
+    except FileNotFoundError:
+        print(f"No baseline at {args.baseline}; run with --save to create one.")
+        return
+    regressions = compare(results, baseline, args.threshold)
+    for key, metric, old, new in regressions:
+        print(f"REGRESSION {key} {metric}: {old:.6g} -> {new:.6g} ({new / old - 1:+.0%})")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
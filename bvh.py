@@ -0,0 +1,210 @@
+import numpy as np
+import profiling
+
+
+_NEAREST_FIRST_VISITS = 3
+_ARRAY_NAMES = ('face_normals', 'face_areas', 'leaf_start', 'slot_faces', 'v0', 'edge1', 'edge2', 'node_min', 'node_max')
+
+
+class BVH:
+    """
+    Bounding-volume hierarchy over a triangle mesh with batched ray queries.
+
+    The tree is a complete binary tree stored heap-style (the children of node
+    i are 2i + 1 and 2i + 2) and is built one level at a time: every node's
+    triangles are split at the median centroid along the node's longest axis
+    with a single segmented sort per level. Rays are traversed breadth-first
+    as whole arrays of (ray, node) pairs, so every step is a vectorized NumPy
+    operation.
+
+    Parameters:
+    vertices (array): Vertex coordinates of shape (n, 3).
+    triangles (array): Vertex indices of shape (m, 3).
+    leaf_size (int): Maximum number of triangles per leaf.
+    """
+
+    def __init__(self, vertices, triangles, leaf_size=8):
+        vertices = np.asarray(vertices, dtype=np.float64)
+        triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+        corners = vertices[triangles]
+        self.num_triangles = len(triangles)
+        self.leaf_size = leaf_size
+
+        edge1 = corners[:, 1] - corners[:, 0]
+        edge2 = corners[:, 2] - corners[:, 0]
+        normals = np.cross(edge1, edge2)
+        lengths = np.linalg.norm(normals, axis=1)
+        self.face_normals = normals / np.where(lengths > 0, lengths, 1)[:, None]
+        self.face_areas = 0.5 * lengths
+
+        num_leaves = max(1, -(-self.num_triangles // leaf_size))
+        self.depth = int(np.ceil(np.log2(num_leaves))) if num_leaves > 1 else 0
+        self.width = 1 << self.depth
+        # Leaf j owns slots [leaf_start[j], leaf_start[j + 1]); the bounds of
+        # node j on level k are the same formula with 2**k in place of width.
+        self.leaf_start = np.arange(self.width + 1) * self.num_triangles // self.width
+
+        centroids = corners.mean(axis=1)
+        order = np.arange(self.num_triangles)
+        slots = np.arange(self.num_triangles)
+        for level in range(self.depth):
+            starts = np.arange(1 << level) * self.num_triangles >> level
+            segment = np.searchsorted(starts, slots, side='right') - 1
+            points = centroids[order]
+            extent = np.maximum.reduceat(points, starts) - np.minimum.reduceat(points, starts)
+            axis = np.argmax(extent, axis=1)
+            key = points[slots, axis[segment]]
+            order = order[np.lexsort((key, segment))]
+
+        self.slot_faces = order
+        self.v0 = corners[order, 0]
+        self.edge1 = edge1[order]
+        self.edge2 = edge2[order]
+
+        self.node_min = np.full((3, 2 * self.width - 1), np.nan)
+        self.node_max = np.full((3, 2 * self.width - 1), np.nan)
+        if self.num_triangles == 0:
+            return
+        level_min = np.minimum.reduceat(corners[order].min(axis=1), self.leaf_start[:-1])
+        level_max = np.maximum.reduceat(corners[order].max(axis=1), self.leaf_start[:-1])
+        first = self.width - 1
+        while True:
+            self.node_min[:, first:first + len(level_min)] = level_min.T
+            self.node_max[:, first:first + len(level_max)] = level_max.T
+            if first == 0:
+                break
+            level_min = level_min.reshape(-1, 2, 3).min(axis=1)
+            level_max = level_max.reshape(-1, 2, 3).max(axis=1)
+            first = (first - 1) // 2
+
+    def to_arrays(self):
+        """Return the arrays that fully describe the hierarchy, e.g. to share or store it."""
+        return {name: getattr(self, name) for name in _ARRAY_NAMES} | {'leaf_size': np.array(self.leaf_size)}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Rebuild a hierarchy from `to_arrays()` output without copying the arrays."""
+        bvh = cls.__new__(cls)
+        for name in _ARRAY_NAMES:
+            setattr(bvh, name, arrays[name])
+        bvh.leaf_size = int(arrays['leaf_size'])
+        bvh.num_triangles = len(bvh.slot_faces)
+        bvh.width = len(bvh.leaf_start) - 1
+        bvh.depth = bvh.width.bit_length() - 1
+        return bvh
+
+    @property
+    def bounds(self):
+        return self.node_min[:, 0], self.node_max[:, 0]
+
+    def intersect(self, origins, directions, t_min=1e-9, t_max=np.inf, chunk_size=65536):
+        """
+        Find the closest triangle hit by every ray in a batch.
+
+        Parameters:
+        origins (array): Ray origins of shape (n, 3).
+        directions (array): Ray directions of shape (n, 3), not necessarily unit.
+        t_min, t_max (float): Accepted range of the ray parameter.
+        chunk_size (int): Number of rays traversed together.
+
+        Returns:
+        tuple: Ray parameter t (inf on a miss), face index (-1 on a miss),
+        hit points and unit geometric face normals (zero on a miss).
+        """
+        origins = np.asarray(origins, dtype=np.float64)
+        directions = np.asarray(directions, dtype=np.float64)
+        num_rays = len(origins)
+        profiling.count('rays_traced', num_rays)
+        t = np.full(num_rays, np.inf)
+        faces = np.full(num_rays, -1, dtype=np.int64)
+        for start in range(0, num_rays, chunk_size):
+            stop = min(start + chunk_size, num_rays)
+            t[start:stop], faces[start:stop] = self._traverse(origins[start:stop], directions[start:stop], t_min, t_max)
+        hit = faces >= 0
+        points = origins + directions * np.where(hit, t, 0)[:, None]
+        normals = np.zeros((num_rays, 3))
+        normals[hit] = self.face_normals[faces[hit]]
+        return t, faces, points, normals
+
+    def _traverse(self, origins, directions, t_min, t_max):
+        num_rays = len(origins)
+        origin_axes = np.ascontiguousarray(origins.T)
+        safe = np.where(np.abs(directions) < 1e-30, 1e-30, directions)
+        inverse_axes = np.ascontiguousarray(1.0 / safe.T)
+        best_t = np.full(num_rays, float(t_max))
+        best_slot = np.full(num_rays, -1, dtype=np.int64)
+
+        rays = np.arange(num_rays)
+        nodes = np.zeros(num_rays, dtype=np.int64)
+        for level in range(self.depth + 1):
+            t_near = self._boxes_hit(origin_axes, inverse_axes, rays, nodes, t_min, t_max)
+            keep = t_near < np.inf
+            rays, nodes, t_near = rays[keep], nodes[keep], t_near[keep]
+            if level < self.depth:
+                rays = np.repeat(rays, 2)
+                nodes = (2 * nodes[:, None] + np.array([1, 2])).ravel()
+
+        # Visit each ray's leaves nearest first: once a ray has a hit, every
+        # leaf whose box starts beyond it is skipped.
+        order = np.lexsort((t_near, rays))
+        rays, leaves, t_near = rays[order], nodes[order] - (self.width - 1), t_near[order]
+        group_start = np.flatnonzero(np.r_[True, rays[1:] != rays[:-1]])
+        rank = np.arange(len(rays)) - np.repeat(group_start, np.diff(np.r_[group_start, len(rays)]))
+        for visit in range(_NEAREST_FIRST_VISITS + 1):
+            batch = rank == visit if visit < _NEAREST_FIRST_VISITS else rank >= visit
+            batch &= t_near <= best_t[rays]
+            self._test_leaves(origins, directions, rays[batch], leaves[batch], t_min, best_t, best_slot)
+
+        hit = best_slot >= 0
+        faces = np.full(num_rays, -1, dtype=np.int64)
+        faces[hit] = self.slot_faces[best_slot[hit]]
+        return np.where(hit, best_t, np.inf), faces
+
+    def _test_leaves(self, origins, directions, rays, leaves, t_min, best_t, best_slot):
+        pairs_per_block = max(1, (1 << 20) // self.leaf_size)
+        lanes = np.arange(self.leaf_size)
+        for start in range(0, len(rays), pairs_per_block):
+            block_leaves = leaves[start:start + pairs_per_block, None]
+            slots = (self.leaf_start[block_leaves] + lanes).ravel()
+            valid = slots < self.leaf_start[block_leaves + 1].repeat(self.leaf_size, axis=1).ravel()
+            block_rays = np.repeat(rays[start:start + pairs_per_block], self.leaf_size)[valid]
+            slots = slots[valid]
+            profiling.count('triangles_tested', len(slots))
+            t = self._triangles_hit(origins[block_rays], directions[block_rays], slots, t_min)
+            closer = t < best_t[block_rays]
+            block_rays, slots, t = block_rays[closer], slots[closer], t[closer]
+            np.minimum.at(best_t, block_rays, t)
+            winner = t == best_t[block_rays]
+            best_slot[block_rays[winner]] = slots[winner]
+
+    def _boxes_hit(self, origin_axes, inverse_axes, rays, nodes, t_min, t_max):
+        """Entry distance of every (ray, node) pair, inf where the box is missed or beyond t_max."""
+        t_near = None
+        for axis in range(3):
+            origin = origin_axes[axis][rays]
+            inverse = inverse_axes[axis][rays]
+            low = (self.node_min[axis][nodes] - origin) * inverse
+            high = (self.node_max[axis][nodes] - origin) * inverse
+            if t_near is None:
+                t_near = np.minimum(low, high)
+                t_far = np.maximum(low, high)
+            else:
+                t_near = np.maximum(t_near, np.minimum(low, high))
+                t_far = np.minimum(t_far, np.maximum(low, high))
+        entered = (t_near <= t_far) & (t_far >= t_min) & (t_near <= t_max)
+        return np.where(entered, t_near, np.inf)
+
+    def _triangles_hit(self, origins, directions, slots, t_min):
+        edge1 = self.edge1[slots]
+        edge2 = self.edge2[slots]
+        p = np.cross(directions, edge2)
+        det = np.einsum('ij,ij->i', edge1, p)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inverse_det = 1.0 / det
+            s = origins - self.v0[slots]
+            u = np.einsum('ij,ij->i', s, p) * inverse_det
+            q = np.cross(s, edge1)
+            v = np.einsum('ij,ij->i', directions, q) * inverse_det
+            t = np.einsum('ij,ij->i', edge2, q) * inverse_det
+            inside = (det != 0) & (u >= 0) & (v >= 0) & (u + v <= 1) & (t > t_min)
+        return np.where(inside, t, np.inf)
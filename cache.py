@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+import numpy as np
+from bvh import BVH
+from geometry import aircraft_proportions, build_shape, mesh_from_polydata
+from mesh_import import fit_to_size, is_mesh_file, load_mesh
+
+# Bump whenever the tessellation or the BVH layout changes so stale entries
+# are never picked up.
+CACHE_VERSION = 4
+
+DEFAULT_CACHE_DIR = os.environ.get('HAVEBLUE_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'haveblue'))
+
+
+def geometry_key(**params):
+    """Content hash of the parameters a mesh is built from."""
+    payload = json.dumps(dict(params, version=CACHE_VERSION), sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class GeometryCache:
+    """
+    Cache of triangulated meshes and their intersection hierarchies.
+
+    Entries are keyed by a hash of the shape type, size, resolution and
+    aircraft proportions, or for imported meshes of the file path,
+    modification time and length. They are kept in memory with
+    least-recently-used eviction and, when a directory is given, stored on
+    disk as .npy files that later runs map into memory instead of
+    tessellating the shape and rebuilding the BVH.
+
+    Parameters:
+    directory (str): On-disk location, memory only if None.
+    max_entries (int): Number of meshes kept in memory.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_entries=8):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def get(self, shape, size, resolution=50, proportions=None):
+        """
+        Return (vertices, triangles, bvh, parts) for a shape, building it only on a miss.
+
+        `parts` holds the part id of every triangle, see geometry.shape_parts.
+        Aircraft entries are also keyed by their complete proportions.
+
+        `shape` may also be the path of an STL, OBJ or PLY file; the imported
+        mesh is centered and scaled to fit in [-size, size]^3 and kept at full
+        resolution.
+        """
+        if is_mesh_file(shape):
+            stat = os.stat(shape)
+            params = {'shape': 'mesh', 'path': os.path.abspath(shape), 'mtime': stat.st_mtime_ns,
+                      'bytes': stat.st_size, 'size': float(size)}
+        else:
+            params = {'shape': shape, 'size': float(size), 'resolution': int(resolution)}
+            if shape == 'aircraft':
+                params['proportions'] = aircraft_proportions(proportions)
+        key = geometry_key(**params)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        mesh = self.load(key) if self.directory else None
+        if mesh is None:
+            if is_mesh_file(shape):
+                vertices, triangles = load_mesh(shape)
+                vertices = fit_to_size(vertices, size)
+                parts = np.zeros(len(triangles), dtype=np.int32)
+            else:
+                vertices, triangles, parts = mesh_from_polydata(build_shape(shape, size, resolution, proportions), 'part')
+            mesh = (vertices, triangles, BVH(vertices, triangles), parts)
+            if self.directory:
+                self.store(key, mesh, params)
+        self.entries[key] = mesh
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return mesh
+
+    def load(self, key):
+        path = os.path.join(self.directory, key)
+        if not os.path.isdir(path):
+            return None
+        arrays = {name[:-4]: np.load(os.path.join(path, name), mmap_mode='r')
+                  for name in os.listdir(path) if name.endswith('.npy')}
+        bvh = BVH.from_arrays({name[4:]: array for name, array in arrays.items() if name.startswith('bvh_')})
+        return arrays['vertices'], arrays['triangles'], bvh, arrays['parts']
+
+    def store(self, key, mesh, params):
+        vertices, triangles, bvh, parts = mesh
+        os.makedirs(self.directory, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=self.directory)
+        np.save(os.path.join(staging, 'vertices.npy'), vertices)
+        np.save(os.path.join(staging, 'triangles.npy'), triangles)
+        np.save(os.path.join(staging, 'parts.npy'), parts)
+        for name, array in bvh.to_arrays().items():
+            np.save(os.path.join(staging, f'bvh_{name}.npy'), array)
+        with open(os.path.join(staging, 'params.json'), 'w') as handle:
+            json.dump(dict(params, version=CACHE_VERSION), handle)
+        try:
+            os.rename(staging, os.path.join(self.directory, key))
+        except OSError:
+            # Another process stored the same entry first.
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def clear(self):
+        """Forget every entry in memory and delete the stored ones."""
+        self.entries.clear()
+        if not (self.directory and os.path.isdir(self.directory)):
+            return
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if os.path.isfile(os.path.join(path, 'params.json')):
+                shutil.rmtree(path, ignore_errors=True)
+
+
+default_cache = GeometryCache()
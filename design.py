@@ -0,0 +1,267 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from cache import CACHE_VERSION, DEFAULT_CACHE_DIR, GeometryCache
+from geometry import AIRCRAFT_PROPORTIONS, aircraft_proportions
+from materials import MATERIALS
+from rcs import angle_grid
+from simulation import ScatteringSimulation
+
+# Bump whenever an objective or the simulation it runs changes meaning, so
+# memoized values are never reused across versions.
+DESIGN_VERSION = 2
+
+DEFAULT_MEMO_DIR = os.path.join(DEFAULT_CACHE_DIR, 'designs')
+
+DEFAULT_SETTINGS = {
+    'size': 1.0,
+    'frequency': 1e10,
+    'resolution': 30,
+    'max_bounces': 1,
+    'materials': None,
+    'seed': 0,
+    # Mean RCS: look angles in degrees and estimator.
+    'azimuths': [0.0, 90.0, 180.0, 270.0],
+    'elevations': [0.0],
+    'method': 'po',
+    'sbr_rays': 100000,
+    # Ground hits: samples and stopping tolerance in percentage points.
+    'samples': 10 ** 6,
+    'tolerance': 0.25,
+}
+
+
+def mean_rcs(simulation, settings):
+    """RCS in dBsm of the power averaged over the look angles."""
+    rcs = simulation.rcs_pattern(settings['azimuths'], settings['elevations'], 1, settings['method'],
+                                 settings['sbr_rays'])
+    return float(10 * np.log10(np.mean(10 ** (rcs / 10))))
+
+
+def ground_hits(simulation, settings):
+    """Percentage of radar power reflected towards the ground."""
+    percentage, _, _ = simulation.ground_hit_percentage(settings['tolerance'], max_samples=settings['samples'])
+    return float(percentage)
+
+
+OBJECTIVES = {
+    'mean_rcs': mean_rcs,
+    'ground_hits': ground_hits,
+}
+
+
+def design_key(proportions, objective, settings):
+    """Content hash of everything an evaluated design point depends on."""
+    payload = json.dumps({'proportions': aircraft_proportions(proportions), 'objective': objective,
+                          'settings': settings, 'version': DESIGN_VERSION, 'cache_version': CACHE_VERSION},
+                         sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class DesignMemo:
+    """
+    Objective values of evaluated design points, keyed by design_key.
+
+    Every point is its own small JSON file written atomically, so concurrent,
+    interrupted and overlapping sweeps share results without recomputing.
+
+    Parameters:
+    directory (str): On-disk location, memory only if None.
+    """
+
+    def __init__(self, directory=DEFAULT_MEMO_DIR):
+        self.directory = directory
+        self.values = {}
+
+    def get(self, key):
+        if key not in self.values and self.directory:
+            try:
+                with open(os.path.join(self.directory, f'{key}.json')) as handle:
+                    self.values[key] = json.load(handle)['value']
+            except FileNotFoundError:
+                return None
+        return self.values.get(key)
+
+    def store(self, key, proportions, objective, value):
+        self.values[key] = value
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        handle, staging = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(handle, 'w') as output:
+            json.dump({'proportions': proportions, 'objective': objective, 'value': value}, output)
+        os.replace(staging, os.path.join(self.directory, f'{key}.json'))
+
+
+def evaluate(proportions, objective='mean_rcs', settings=None):
+    """
+    Objective value of one aircraft design.
+
+    Parameters:
+    proportions (dict): Overrides of geometry.AIRCRAFT_PROPORTIONS.
+    objective (str): Key of OBJECTIVES.
+    settings (dict): Overrides of DEFAULT_SETTINGS.
+
+    Returns:
+    float: Objective value, lower is better.
+    """
+    settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+    # Every design is a new mesh, so it is not worth keeping on disk.
+    simulation = ScatteringSimulation('aircraft', settings['size'], settings['frequency'], 0, settings['seed'],
+                                      settings['max_bounces'], settings['resolution'], GeometryCache(directory=None),
+                                      materials=settings['materials'], proportions=proportions)
+    simulation.build_geometry()
+    return OBJECTIVES[objective](simulation, settings)
+
+
+def sweep(designs, objective='mean_rcs', settings=None, workers=None, memo=None, progress=None):
+    """
+    Evaluate design points across a process pool, skipping memoized ones.
+
+    Parameters:
+    designs (list): Proportion overrides, one dict per design point.
+    objective (str): Key of OBJECTIVES.
+    settings (dict): Overrides of DEFAULT_SETTINGS.
+    workers (int): Worker processes, all cores if omitted, in-process if 1.
+    memo (DesignMemo): Where values are looked up and stored, the shared on-disk memo if omitted.
+    progress (callable): Optional f(proportions, value) called as points finish.
+
+    Returns:
+    list: (proportions, value) for every design, in the given order.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective: {objective}")
+    settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+    memo = DesignMemo() if memo is None else memo
+    keys = [design_key(design, objective, settings) for design in designs]
+    values = {key: memo.get(key) for key in keys}
+    # Overlapping designs in one sweep are evaluated once.
+    missing = {key: design for key, design in zip(keys, designs) if values[key] is None}
+
+    def finish(key, value):
+        values[key] = value
+        memo.store(key, aircraft_proportions(missing[key]), objective, value)
+        if progress is not None:
+            progress(missing[key], value)
+
+    workers = workers or os.cpu_count()
+    if workers == 1 or len(missing) <= 1:
+        for key, design in missing.items():
+            finish(key, evaluate(design, objective, settings))
+    else:
+        with ProcessPoolExecutor(min(workers, len(missing))) as pool:
+            futures = {pool.submit(evaluate, design, objective, settings): key for key, design in missing.items()}
+            for future in as_completed(futures):
+                finish(futures[future], future.result())
+    return [(design, values[key]) for key, design in zip(keys, designs)]
+
+
+def grid_designs(ranges):
+    """Every combination of the given values, e.g. {'wing_span': [1.0, 1.3]}."""
+    names = list(ranges)
+    return [dict(zip(names, values)) for values in itertools.product(*(ranges[name] for name in names))]
+
+
+def refine(bounds, objective='mean_rcs', settings=None, rounds=4, per_round=16, shrink=0.5, seed=0, workers=None,
+           memo=None, progress=None):
+    """
+    Minimize the objective by random search in a box that shrinks around the best design.
+
+    Parameters:
+    bounds (dict): (low, high) range of every varied proportion.
+    rounds (int): Number of search rounds.
+    per_round (int): Designs evaluated per round.
+    shrink (float): Factor the box shrinks by after every round.
+    seed (int): Seed of the search; a rerun with the same seed hits the memo.
+    Other parameters as for sweep.
+
+    Returns:
+    tuple: Best proportions and value, and the (proportions, value) of every evaluated design.
+    """
+    rng = np.random.default_rng(seed)
+    names = list(bounds)
+    low = np.array([bounds[name][0] for name in names], dtype=float)
+    high = np.array([bounds[name][1] for name in names], dtype=float)
+    center, width = (low + high) / 2, high - low
+    history = []
+    for _ in range(rounds):
+        samples = np.clip(center + (rng.random((per_round, len(names))) - 0.5) * width, low, high)
+        designs = [dict(zip(names, (round(float(value), 6) for value in sample))) for sample in samples]
+        if history:
+            designs.append(min(history, key=lambda item: item[1])[0])
+        history.extend(sweep(designs, objective, settings, workers, memo, progress))
+        best = min(history, key=lambda item: item[1])[0]
+        center = np.array([best[name] for name in names])
+        width *= shrink
+    best, value = min(history, key=lambda item: item[1])
+    return best, value, history
+
+
+def parse_range(text):
+    """'NAME=START:STOP:COUNT' or 'NAME=V1,V2,...' into (name, values)."""
+    name, values = text.split('=', 1)
+    if name not in AIRCRAFT_PROPORTIONS:
+        raise argparse.ArgumentTypeError(f"unknown proportion {name!r}; one of {', '.join(AIRCRAFT_PROPORTIONS)}")
+    if ':' in values:
+        start, stop, count = values.split(':')
+        return name, [round(float(value), 6) for value in np.linspace(float(start), float(stop), int(count))]
+    return name, [float(value) for value in values.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parametric aircraft design sweep. Designs run in parallel and "
+                                                 "evaluated points are memoized on disk by parameter hash.")
+    parser.add_argument('--vary', nargs='+', type=parse_range, required=True, metavar='NAME=START:STOP:COUNT',
+                        help=f"Proportions to vary (multiples of size): {', '.join(AIRCRAFT_PROPORTIONS)}.")
+    parser.add_argument('--objective', default='mean_rcs', choices=list(OBJECTIVES), help='Value to minimize.')
+    parser.add_argument('--refine', type=int, default=0, metavar='ROUNDS',
+                        help='Random search shrinking around the best design within the --vary ranges instead of the full grid.')
+    parser.add_argument('--per_round', type=int, default=16, help='Designs per refinement round.')
+    parser.add_argument('--size', type=float, default=DEFAULT_SETTINGS['size'], help='Aircraft scale.')
+    parser.add_argument('--frequency', type=float, default=DEFAULT_SETTINGS['frequency'], help='Radar frequency in Hz.')
+    parser.add_argument('--resolution', type=int, default=DEFAULT_SETTINGS['resolution'], help='Facets around curved surfaces.')
+    parser.add_argument('--azimuth', nargs=3, type=float, default=[0, 360, 90], metavar=('START', 'STOP', 'STEP'), help='Azimuth grid in degrees for mean_rcs.')
+    parser.add_argument('--elevation', nargs=3, type=float, default=[0, 0, 1], metavar=('START', 'STOP', 'STEP'), help='Elevation grid in degrees for mean_rcs.')
+    parser.add_argument('--method', default='po', choices=['po', 'sbr'], help='RCS estimate for mean_rcs.')
+    parser.add_argument('--max_bounces', type=int, default=DEFAULT_SETTINGS['max_bounces'], help='Reflections followed per ray.')
+    parser.add_argument('--material', default=None, help='Surface material of the whole aircraft, perfect mirrors if omitted.')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes, all cores by default.')
+    parser.add_argument('--memo_dir', default=DEFAULT_MEMO_DIR, help='Directory of memoized design values.')
+    parser.add_argument('--output', default=None, help='JSON file the evaluated designs are written to.')
+    args = parser.parse_args()
+    if args.material is not None and args.material not in MATERIALS:
+        parser.error(f"unknown material {args.material!r}; one of {', '.join(MATERIALS)}")
+
+    settings = {'size': args.size, 'frequency': args.frequency, 'resolution': args.resolution,
+                'azimuths': angle_grid(*args.azimuth).tolist(), 'elevations': angle_grid(*args.elevation).tolist(),
+                'method': args.method, 'max_bounces': args.max_bounces, 'materials': args.material}
+    ranges = dict(args.vary)
+    memo = DesignMemo(args.memo_dir)
+
+    def describe(design, value):
+        return ' '.join(f"{name}={amount:g}" for name, amount in design.items()) + f"  {args.objective}={value:.4f}"
+
+    def report(design, value):
+        print(describe(design, value))
+
+    if args.refine:
+        bounds = {name: (min(values), max(values)) for name, values in ranges.items()}
+        _, _, results = refine(bounds, args.objective, settings, args.refine, args.per_round, workers=args.workers,
+                               memo=memo, progress=report)
+    else:
+        results = sweep(grid_designs(ranges), args.objective, settings, args.workers, memo, report)
+    results.sort(key=lambda item: item[1])
+    best, value = results[0]
+    print(f"Best of {len(results)}: {describe(best, value)}")
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump([{'proportions': design, args.objective: value} for design, value in results], handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import numpy as np
+
+# Parts of the aircraft, in the order of the ids stored in its 'part' cell
+# data; every other shape is a single part.
+AIRCRAFT_PARTS = ('fuselage', 'nose_cone', 'cockpit', 'wings', 'stabilizer')
+SINGLE_PART = ('body',)
+
+
+def shape_parts(shape):
+    """Names of the parts of a shape, indexed by the part ids of its faces."""
+    return AIRCRAFT_PARTS if shape == 'aircraft' else SINGLE_PART
+
+
+def build_shape(shape, size, resolution=50, proportions=None):
+    """
+    Build the surface of a simulated shape without creating any rendering objects.
+
+    Parameters:
+    shape (str): One of 'sphere', 'cube' or 'aircraft'.
+    size (float): Scale of the shape.
+    resolution (int): Number of facets around curved surfaces.
+    proportions (dict): Aircraft proportions, see AIRCRAFT_PROPORTIONS.
+
+    Returns:
+    vtkPolyData: Surface of the shape.
+    """
+    import vtk
+    if shape == 'sphere':
+        shape_source = vtk.vtkSphereSource()
+        shape_source.SetRadius(size)
+        shape_source.SetThetaResolution(resolution)
+        shape_source.SetPhiResolution(resolution)
+    elif shape == 'cube':
+        shape_source = vtk.vtkCubeSource()
+        shape_source.SetXLength(size)
+        shape_source.SetYLength(size)
+        shape_source.SetZLength(size)
+    elif shape == 'aircraft':
+        return build_aircraft(size, resolution, proportions)
+    else:
+        raise ValueError(f"Unknown shape: {shape}")
+    return tag_part(shape_source, 0)
+
+
+def tag_part(source, part):
+    """Run a source and return its output with every cell labelled `part` in an int32 'part' cell array."""
+    import vtk
+    from vtk.util import numpy_support
+    source.Update()
+    polydata = vtk.vtkPolyData()
+    polydata.ShallowCopy(source.GetOutput())
+    labels = numpy_support.numpy_to_vtk(np.full(polydata.GetNumberOfCells(), part, dtype=np.int32), deep=True)
+    labels.SetName('part')
+    polydata.GetCellData().AddArray(labels)
+    return polydata
+
+
+def make_wing(points, thickness=0.02):
+    import vtk
+    poly = vtk.vtkPolygon()
+    poly.GetPointIds().SetNumberOfIds(len(points))
+    pts = vtk.vtkPoints()
+    for i, p in enumerate(points):
+        pts.InsertNextPoint(p)
+        poly.GetPointIds().SetId(i, i)
+    pd = vtk.vtkPolyData()
+    pd.SetPoints(pts)
+    polys = vtk.vtkCellArray()
+    polys.InsertNextCell(poly)
+    pd.SetPolys(polys)
+    extrude = vtk.vtkLinearExtrusionFilter()
+    extrude.SetInputData(pd)
+    extrude.SetExtrusionTypeToNormalExtrusion()
+    extrude.SetScaleFactor(thickness)
+    extrude.Update()
+    return extrude
+
+
+# Aircraft proportions as multiples of `size`. The defaults give the mesh
+# the simulation has always used: every part is centered on the origin, the
+# fuselage runs along y and the wings lie in the x-z plane. Positions shift
+# parts along the fuselage axis (y) and the cockpit height along z; the
+# stabilizer drop is how far its chord corner reaches below the wings (-z).
+AIRCRAFT_PROPORTIONS = {
+    'fuselage_radius': 0.08,
+    'fuselage_length': 3.5,
+    'nose_length': 0.4,
+    'cockpit_radius': 0.12,
+    'cockpit_position': 0.0,
+    'cockpit_height': 0.0,
+    'wing_span': 1.3,
+    'wing_chord': 1.0,
+    'wing_position': 0.0,
+    'tail_span': 0.7,
+    'tail_chord': 0.4,
+    'tail_position': 0.0,
+    'stabilizer_height': 0.8,
+    'stabilizer_chord': 0.15,
+    'stabilizer_drop': 0.1,
+}
+
+
+def aircraft_proportions(proportions=None):
+    """AIRCRAFT_PROPORTIONS updated with the given ones, rejecting unknown names."""
+    proportions = dict(proportions or {})
+    unknown = set(proportions) - set(AIRCRAFT_PROPORTIONS)
+    if unknown:
+        raise ValueError(f"Unknown aircraft proportions: {sorted(unknown)}")
+    return {name: float(proportions.get(name, default)) for name, default in AIRCRAFT_PROPORTIONS.items()}
+
+
+def build_aircraft(size, resolution=50, proportions=None):
+    """
+    Build the aircraft surface from fuselage, nose cone, cockpit, wings and stabilizer.
+
+    Parameters:
+    size (float): Scale of the aircraft.
+    resolution (int): Number of facets around the fuselage, nose cone and cockpit.
+    proportions (dict): Overrides of AIRCRAFT_PROPORTIONS.
+
+    Returns:
+    vtkPolyData: Appended surface of all parts, with the index of every
+    cell's part in AIRCRAFT_PARTS as 'part' cell data.
+    """
+    import vtk
+    p = {name: size * value for name, value in aircraft_proportions(proportions).items()}
+
+    fuselage = vtk.vtkCylinderSource()
+    fuselage.SetRadius(p['fuselage_radius'])
+    fuselage.SetHeight(p['fuselage_length'])
+    fuselage.SetResolution(resolution)
+
+    nose_cone = vtk.vtkConeSource()
+    nose_cone.SetRadius(p['fuselage_radius'])
+    nose_cone.SetHeight(p['nose_length'])
+    nose_cone.SetResolution(resolution)
+
+    cockpit = vtk.vtkSphereSource()
+    cockpit.SetRadius(p['cockpit_radius'])
+    cockpit.SetThetaResolution(resolution)
+    cockpit.SetPhiResolution(resolution)
+    cockpit.SetCenter(0, p['cockpit_position'], p['cockpit_height'])
+
+    main_wing = make_wing([
+        (p['wing_span'], p['wing_position'], 0.0),
+        (0, p['wing_position'], -p['wing_chord']),
+        (-p['wing_span'], p['wing_position'], 0.0)
+    ])
+    tail_wing = make_wing([
+        (p['tail_span'], p['tail_position'], 0),
+        (0, p['tail_position'], -p['tail_chord']),
+        (-p['tail_span'], p['tail_position'], 0)
+    ])
+    stabilizer = make_wing([
+        (0, p['tail_position'], 0),
+        (p['stabilizer_chord'], p['tail_position'], -p['stabilizer_drop']),
+        (0, p['tail_position'] + p['stabilizer_height'], 0)
+    ])
+
+    parts = [(fuselage, 'fuselage'), (nose_cone, 'nose_cone'), (cockpit, 'cockpit'),
+             (main_wing, 'wings'), (tail_wing, 'wings'), (stabilizer, 'stabilizer')]
+    append_filter = vtk.vtkAppendPolyData()
+    for source, part in parts:
+        append_filter.AddInputData(tag_part(source, AIRCRAFT_PARTS.index(part)))
+    append_filter.Update()
+    return append_filter.GetOutput()
+
+
+def mesh_from_polydata(polydata, cell_array=None):
+    """
+    Triangulate a polydata and return its surface as NumPy arrays.
+
+    Parameters:
+    polydata (vtkPolyData): Surface made of polygons and/or triangle strips.
+    cell_array (str): Name of a cell data array to carry over to the triangles.
+
+    Returns:
+    tuple: Vertex coordinates of shape (n, 3) and triangle vertex indices of
+    shape (m, 3), followed by the triangles' values of `cell_array` if given.
+    """
+    import vtk
+    from vtk.util import numpy_support
+    triangle_filter = vtk.vtkTriangleFilter()
+    triangle_filter.SetInputData(polydata)
+    triangle_filter.PassVertsOff()
+    triangle_filter.PassLinesOff()
+    triangle_filter.Update()
+    output = triangle_filter.GetOutput()
+    vertices = numpy_support.vtk_to_numpy(output.GetPoints().GetData()).astype(np.float64)
+    connectivity = numpy_support.vtk_to_numpy(output.GetPolys().GetConnectivityArray())
+    triangles = connectivity.reshape(-1, 3).astype(np.int64)
+    if cell_array is not None:
+        return vertices, triangles, numpy_support.vtk_to_numpy(output.GetCellData().GetArray(cell_array)).copy()
+    return vertices, triangles
+
+
+def polydata_from_mesh(vertices, triangles):
+    """
+    Wrap mesh arrays as a polydata without copying them.
+
+    Parameters:
+    vertices (array): Vertex coordinates of shape (n, 3).
+    triangles (array): Triangle vertex indices of shape (m, 3).
+
+    Returns:
+    vtkPolyData: Triangle surface sharing memory with the arrays.
+    """
+    import vtk
+    from vtk.util import numpy_support
+    points = vtk.vtkPoints()
+    points.SetData(numpy_support.numpy_to_vtk(np.ascontiguousarray(vertices), deep=False))
+    offsets = np.arange(0, 3 * len(triangles) + 1, 3, dtype=np.int64)
+    connectivity = np.ascontiguousarray(triangles, dtype=np.int64).reshape(-1)
+    polys = vtk.vtkCellArray()
+    polys.SetData(numpy_support.numpy_to_vtkIdTypeArray(offsets, deep=False),
+                  numpy_support.numpy_to_vtkIdTypeArray(connectivity, deep=False))
+    polydata = vtk.vtkPolyData()
+    polydata.SetPoints(points)
+    polydata.SetPolys(polys)
+    return polydata
+
+
+def add_cell_data(polydata, arrays, active=None):
+    """
+    Attach per-triangle arrays to a polydata as named cell data.
+
+    Parameters:
+    polydata (vtkPolyData): Surface with one cell per array entry.
+    arrays (dict): Arrays of shape (m,) keyed by name; ValueError if m is not the cell count.
+    active (str): Name of the array made the active scalars, used for coloring.
+
+    Returns:
+    vtkPolyData: The same polydata.
+    """
+    from vtk.util import numpy_support
+    cell_data = polydata.GetCellData()
+    for name, values in arrays.items():
+        if len(values) != polydata.GetNumberOfCells():
+            raise ValueError(f"{name} has {len(values)} values for {polydata.GetNumberOfCells()} cells")
+        array = numpy_support.numpy_to_vtk(np.ascontiguousarray(values), deep=True)
+        array.SetName(name)
+        cell_data.AddArray(array)
+    if active is not None:
+        cell_data.SetActiveScalars(active)
+    return polydata
+
+
+def write_polydata(path, polydata):
+    """Write a polydata to a VTK XML (.vtp) file."""
+    import vtk
+    writer = vtk.vtkXMLPolyDataWriter()
+    writer.SetFileName(path)
+    writer.SetInputData(polydata)
+    writer.Write()
@@ -1,20 +1,198 @@
-import tkinter as tk
-from tkinter import ttk
 import vtk
 import numpy as np
-import hashlib
-import re
+import copy
+from vtk.util import numpy_support
+import profiling
+from simulation import Cancelled, ScatteringSimulation
+
+# Ground-hit estimate shown in the viewer: stop at +-0.5 percentage points.
+REFLECTION_TOLERANCE = 0.5
+REFLECTION_SAMPLES = 10 ** 6
+
+# At most this many rays are drawn as lines whatever num_points is; the
+# scattered directions of all rays are shown as a heatmap on a sphere instead.
+MAX_DISPLAYED_RAYS = 2000
+HEATMAP_BINS = (72, 36)
+HEATMAP_FLOOR = -3.0
+
+
+def set_line_segments(polydata, starts, ends):
+    """
+    Replace the line segments of a polydata in place from whole arrays of endpoints.
+
+    The points buffer and the cell connectivity are handed to VTK as NumPy
+    arrays instead of being inserted one point and one cell at a time, and
+    the polydata is marked modified so existing mappers pick up the change.
+
+    Parameters:
+    polydata (vtkPolyData): Polydata to fill.
+    starts, ends (array): Segment endpoints, each of shape (n, 3).
+    """
+    num_lines = len(starts)
+    point_array = np.empty((2 * num_lines, 3), dtype=np.float32)
+    point_array[0::2] = starts
+    point_array[1::2] = ends
+    points = vtk.vtkPoints()
+    points.SetData(numpy_support.numpy_to_vtk(point_array, deep=False))
+    offsets = np.arange(0, 2 * num_lines + 1, 2, dtype=np.int64)
+    connectivity = np.arange(2 * num_lines, dtype=np.int64)
+    lines = vtk.vtkCellArray()
+    lines.SetData(numpy_support.numpy_to_vtkIdTypeArray(offsets, deep=False),
+                  numpy_support.numpy_to_vtkIdTypeArray(connectivity, deep=False))
+    polydata.SetPoints(points)
+    polydata.SetLines(lines)
+    polydata.Modified()
+
+
+def lines_polydata(starts, ends):
+    """Build a new line-segment polydata, see set_line_segments."""
+    polydata = vtk.vtkPolyData()
+    set_line_segments(polydata, starts, ends)
+    return polydata
+
+
+def incoming_segments(simulation):
+    """Start and end points of the incoming rays that are drawn, at most MAX_DISPLAYED_RAYS."""
+    # Rays are drawn independently, so the first ones are a representative
+    # subsample that stays put when num_points grows.
+    count = min(len(simulation.origins), MAX_DISPLAYED_RAYS)
+    hit = simulation.hit_faces[:count] >= 0
+    ends = np.where(hit[:, None], simulation.hit_points[:count], simulation.targets[:count])
+    return simulation.origins[:count], ends
+
+
+def scattered_segments(simulation):
+    """Reflection segments of the drawn incoming rays."""
+    shown = simulation.scattered_owners < MAX_DISPLAYED_RAYS
+    return simulation.scattered_starts[shown], simulation.scattered_ends[shown]
+
+
+def set_sphere_heatmap(polydata, histogram, radius):
+    """
+    Replace a polydata in place with a latitude-longitude sphere colored by a histogram.
+
+    Every (elevation, azimuth) bin of `histogram` is one quad whose cell
+    scalar is the log10 of its density per steradian relative to the densest
+    bin, clipped at HEATMAP_FLOOR, so the cost depends on the bin count only.
+
+    Parameters:
+    polydata (vtkPolyData): Polydata to fill.
+    histogram (array): Binned weights, shape (elevation bins, azimuth bins) as
+        returned by streaming.direction_histogram.
+    radius (float): Radius of the sphere.
+    """
+    rows, columns = histogram.shape
+    azimuth = np.linspace(-np.pi, np.pi, columns + 1)
+    elevation = np.linspace(-np.pi / 2, np.pi / 2, rows + 1)
+    ring = np.cos(elevation)[:, None]
+    point_array = np.empty((rows + 1, columns + 1, 3), dtype=np.float32)
+    point_array[..., 0] = radius * ring * np.cos(azimuth)
+    point_array[..., 1] = radius * ring * np.sin(azimuth)
+    point_array[..., 2] = radius * np.sin(elevation)[:, None]
+    corner = (np.arange(rows)[:, None] * (columns + 1) + np.arange(columns)).reshape(-1)
+    connectivity = np.stack([corner, corner + 1, corner + columns + 2, corner + columns + 1], axis=1).reshape(-1)
+    offsets = np.arange(0, len(connectivity) + 1, 4, dtype=np.int64)
+
+    solid_angle = 2 * np.pi / columns * np.diff(np.sin(elevation))[:, None]
+    density = histogram / solid_angle
+    peak = density.max()
+    level = np.log10(np.maximum(density / peak, 10 ** HEATMAP_FLOOR)) if peak > 0 else np.full(density.shape, HEATMAP_FLOOR)
+
+    points = vtk.vtkPoints()
+    points.SetData(numpy_support.numpy_to_vtk(point_array.reshape(-1, 3), deep=False))
+    quads = vtk.vtkCellArray()
+    quads.SetData(numpy_support.numpy_to_vtkIdTypeArray(offsets, deep=False),
+                  numpy_support.numpy_to_vtkIdTypeArray(connectivity.astype(np.int64), deep=False))
+    scalars = numpy_support.numpy_to_vtk(level.reshape(-1).astype(np.float32), deep=False)
+    scalars.SetName('scattered_intensity')
+    polydata.SetPoints(points)
+    polydata.SetPolys(quads)
+    polydata.GetCellData().SetScalars(scalars)
+    polydata.Modified()
+
+
+def heatmap_actor(polydata):
+    """Translucent actor for set_sphere_heatmap; empty bins are invisible and the near half is culled."""
+    lookup_table = vtk.vtkLookupTable()
+    lookup_table.SetHueRange(0.66, 0.0)
+    lookup_table.SetAlphaRange(0.0, 0.8)
+    lookup_table.Build()
+    mapper = vtk.vtkPolyDataMapper()
+    mapper.SetInputData(polydata)
+    mapper.SetLookupTable(lookup_table)
+    mapper.SetScalarModeToUseCellData()
+    mapper.SetScalarRange(HEATMAP_FLOOR, 0.0)
+    actor = vtk.vtkActor()
+    actor.SetMapper(mapper)
+    actor.GetProperty().FrontfaceCullingOn()
+    actor.GetProperty().LightingOff()
+    return actor
+
+
+def lines_actor(polydata, color):
+    lines_mapper = vtk.vtkPolyDataMapper()
+    lines_mapper.SetInputData(polydata)
+    actor = vtk.vtkActor()
+    actor.SetMapper(lines_mapper)
+    actor.GetProperty().SetColor(*color)
+    actor.GetProperty().SetLineWidth(2)
+    return actor
+
+
+def compute_simulation(simulation, shape, size, frequency, num_points, progress=None):
+    """
+    The heavy part of applying parameters, safe to run off the UI thread.
+
+    A new simulation is run from scratch; an existing one is updated on a
+    shallow copy, so a cancelled or failed update leaves the displayed
+    simulation untouched. No VTK object is modified.
+
+    Parameters:
+    simulation (ScatteringSimulation): Simulation on display, or None for a new one.
+    shape, size, frequency, num_points: Requested parameters.
+    progress (callable): f(stage, done, total), may raise Cancelled.
+
+    Returns:
+    tuple: The updated simulation, the set of recomputed stages, the new
+    (percentage, interval) ground-hit estimate and the new heatmap direction
+    histogram, each None if unchanged.
+    """
+    if simulation is None:
+        simulation = ScatteringSimulation(shape, size, frequency, num_points, progress=progress)
+        with profiling.stage('simulation'):
+            simulation.run()
+        stages = {'geometry', 'rays', 'scattering', 'phase'}
+    else:
+        simulation = copy.copy(simulation)
+        simulation.progress = progress
+        with profiling.stage('update_simulation'):
+            stages = simulation.update(shape, size, frequency, num_points)
+    reflection = None
+    if stages & {'geometry', 'materials'}:
+        percentage, interval, _ = simulation.ground_hit_percentage(REFLECTION_TOLERANCE, max_samples=REFLECTION_SAMPLES)
+        reflection = (percentage, interval)
+    histogram = None
+    if 'scattering' in stages:
+        # Binning every scattered ray is O(num_points); done here, the UI
+        # thread only copies the small binned array into the heatmap.
+        histogram = simulation.scattered_direction_histogram(HEATMAP_BINS)
+    simulation.progress = None
+    return simulation, stages, reflection, histogram
+
 
 class RadarWaveScatteringSimulation:
-    def __init__(self, shape='aircraft', size=1.0, frequency=1e10, num_points=1000):
-        self.shape = shape
-        self.size = size
-        self.frequency = frequency
-        self.num_points = num_points
-        self.wavelength = 3e8 / frequency
-        self.setup_renderer()
-
-    def setup_renderer(self):
+    def __init__(self, shape='aircraft', size=1.0, frequency=1e10, num_points=1000, show=True, simulation=None,
+                 reflection=None, histogram=None):
+        if simulation is None:
+            simulation = ScatteringSimulation(shape, size, frequency, num_points)
+            with profiling.stage('simulation'):
+                simulation.run()
+        self.simulation = simulation
+        self.setup_renderer(reflection, histogram)
+        if show:
+            self.show()
+
+    def setup_renderer(self, reflection=None, histogram=None):
         self.renderer = vtk.vtkRenderer()
         self.render_window = vtk.vtkRenderWindow()
         self.render_window.AddRenderer(self.renderer)
@@ -31,14 +209,32 @@ class RadarWaveScatteringSimulation:
         camera.SetFocalPoint(0, 0, 0)
         camera.SetViewUp(0, 0, 1)
 
-        self.create_shape()
-        self.create_incoming_waves()
-        self.create_scattered_waves()
+        with profiling.stage('create_shape'):
+            self.create_shape()
+        with profiling.stage('create_incoming_waves'):
+            self.create_incoming_waves()
+        with profiling.stage('create_scattered_waves'):
+            self.create_scattered_waves()
+        with profiling.stage('create_heatmap'):
+            self.create_heatmap(histogram)
+        if reflection is None:
+            self.calculate_reflection_percentage()
+        else:
+            self.display_reflection_percentage(*reflection)
 
-        self.render_window.Render()
-        self.render_window_interactor.Initialize()
+    def show(self):
+        self.start()
         self.render_window_interactor.Start()
 
+    def start(self):
+        """Render and initialize the interactor without entering its event loop."""
+        with profiling.stage('first_render'):
+            self.render_window.Render()
+        if profiling.enabled():
+            self.display_profile()
+            self.render_window.Render()
+        self.render_window_interactor.Initialize()
+
     def add_orientation_marker(self):
         axes = vtk.vtkAxesActor()
         marker = vtk.vtkOrientationMarkerWidget()
@@ -48,216 +244,127 @@ class RadarWaveScatteringSimulation:
         marker.InteractiveOff()
 
     def create_shape(self):
-        if self.shape == 'sphere':
-            shape_source = vtk.vtkSphereSource()
-            shape_source.SetRadius(self.size)
-            shape_source.SetThetaResolution(50)
-            shape_source.SetPhiResolution(50)
-            shape_mapper = vtk.vtkPolyDataMapper()
-            shape_mapper.SetInputConnection(shape_source.GetOutputPort())
-            shape_actor = vtk.vtkActor()
-            shape_actor.SetMapper(shape_mapper)
-            shape_actor.GetProperty().SetColor(1, 0, 0)
-            self.renderer.AddActor(shape_actor)
-        elif self.shape == 'cube':
-            shape_source = vtk.vtkCubeSource()
-            shape_source.SetXLength(self.size)
-            shape_source.SetYLength(self.size)
-            shape_source.SetZLength(self.size)
-            shape_mapper = vtk.vtkPolyDataMapper()
-            shape_mapper.SetInputConnection(shape_source.GetOutputPort())
-            shape_actor = vtk.vtkActor()
-            shape_actor.SetMapper(shape_mapper)
-            shape_actor.GetProperty().SetColor(1, 0, 0)
-            self.renderer.AddActor(shape_actor)
-        elif self.shape == 'aircraft':
-            self.create_aircraft_shape()
-
-    def create_aircraft_shape(self):
-        fuselage = vtk.vtkCylinderSource()
-        fuselage.SetRadius(self.size * 0.08)
-        fuselage.SetHeight(self.size * 3.5)
-        fuselage.SetResolution(50)
-        fuselage_mapper = vtk.vtkPolyDataMapper()
-        fuselage_mapper.SetInputConnection(fuselage.GetOutputPort())
-        fuselage_actor = vtk.vtkActor()
-        fuselage_actor.SetMapper(fuselage_mapper)
-        fuselage_actor.RotateX(90)
-
-        nose_cone = vtk.vtkConeSource()
-        nose_cone.SetRadius(self.size * 0.08)
-        nose_cone.SetHeight(self.size * 0.4)
-        nose_cone.SetResolution(50)
-        nose_cone_mapper = vtk.vtkPolyDataMapper()
-        nose_cone_mapper.SetInputConnection(nose_cone.GetOutputPort())
-        nose_cone_actor = vtk.vtkActor()
-        nose_cone_actor.SetMapper(nose_cone_mapper)
-        nose_cone_actor.SetPosition(0, self.size * 1.75, 0)
-        nose_cone_actor.RotateX(90)
-
-        cockpit = vtk.vtkSphereSource()
-        cockpit.SetRadius(self.size * 0.12)
-        cockpit.SetThetaResolution(50)
-        cockpit.SetPhiResolution(50)
-        cockpit_mapper = vtk.vtkPolyDataMapper()
-        cockpit_mapper.SetInputConnection(cockpit.GetOutputPort())
-        cockpit_actor = vtk.vtkActor()
-        cockpit_actor.SetMapper(cockpit_mapper)
-        cockpit_actor.SetPosition(0, self.size * 0.9, 0.15)
-
-        def make_wing(points, thickness=0.02):
-            poly = vtk.vtkPolygon()
-            poly.GetPointIds().SetNumberOfIds(len(points))
-            pts = vtk.vtkPoints()
-            for i, p in enumerate(points):
-                pts.InsertNextPoint(p)
-                poly.GetPointIds().SetId(i, i)
-            pd = vtk.vtkPolyData()
-            pd.SetPoints(pts)
-            polys = vtk.vtkCellArray()
-            polys.InsertNextCell(poly)
-            pd.SetPolys(polys)
-            extrude = vtk.vtkLinearExtrusionFilter()
-            extrude.SetInputData(pd)
-            extrude.SetExtrusionTypeToNormalExtrusion()
-            extrude.SetScaleFactor(thickness)
-            extrude.Update()
-            return extrude
-
-        main_wing = make_wing([
-            (self.size * 1.3, 0, 0.0),
-            (0, 0, -self.size * 1.0),
-            (-self.size * 1.3, 0, 0.0)
-        ])
-        main_wing_mapper = vtk.vtkPolyDataMapper()
-        main_wing_mapper.SetInputConnection(main_wing.GetOutputPort())
-        main_wing_actor = vtk.vtkActor()
-        main_wing_actor.SetMapper(main_wing_mapper)
-        main_wing_actor.SetPosition(0, 0, self.size * 0.7)
-
-        tail_wing = make_wing([
-            (self.size * 0.7, 0, 0),
-            (0, 0, -self.size * 0.4),
-            (-self.size * 0.7, 0, 0)
-        ])
-        tail_wing_mapper = vtk.vtkPolyDataMapper()
-        tail_wing_mapper.SetInputConnection(tail_wing.GetOutputPort())
-        tail_wing_actor = vtk.vtkActor()
-        tail_wing_actor.SetMapper(tail_wing_mapper)
-        tail_wing_actor.SetPosition(0, 0, -self.size * 1.2)
-
-        stabilizer = make_wing([
-            (0, 0, 0),
-            (self.size * 0.15, 0, -self.size * 0.1),
-            (0, self.size * 0.8, 0)
-        ])
-        stabilizer_mapper = vtk.vtkPolyDataMapper()
-        stabilizer_mapper.SetInputConnection(stabilizer.GetOutputPort())
-        stabilizer_actor = vtk.vtkActor()
-        stabilizer_actor.SetMapper(stabilizer_mapper)
-        stabilizer_actor.SetPosition(0, 0, -self.size * 1.2)
-        stabilizer_actor.RotateX(90)
-
-        append_filter = vtk.vtkAppendPolyData()
-        append_filter.AddInputConnection(fuselage.GetOutputPort())
-        append_filter.AddInputConnection(nose_cone.GetOutputPort())
-        append_filter.AddInputConnection(cockpit.GetOutputPort())
-        append_filter.AddInputConnection(main_wing.GetOutputPort())
-        append_filter.AddInputConnection(tail_wing.GetOutputPort())
-        append_filter.AddInputConnection(stabilizer.GetOutputPort())
-        append_filter.Update()
-
+        self.shape_polydata = vtk.vtkPolyData()
+        shape_normals = vtk.vtkPolyDataNormals()
+        shape_normals.SetInputData(self.shape_polydata)
         shape_mapper = vtk.vtkPolyDataMapper()
-        shape_mapper.SetInputConnection(append_filter.GetOutputPort())
-        shape_actor = vtk.vtkActor()
-        shape_actor.SetMapper(shape_mapper)
-        shape_actor.GetProperty().SetColor(1, 0, 0)
-        shape_actor.GetProperty().SetSpecular(0.5)
-        shape_actor.GetProperty().SetSpecularPower(30)
-        self.renderer.AddActor(shape_actor)
+        shape_mapper.SetInputConnection(shape_normals.GetOutputPort())
+        self.shape_actor = vtk.vtkActor()
+        self.shape_actor.SetMapper(shape_mapper)
+        self.shape_actor.GetProperty().SetColor(1, 0, 0)
+        self.renderer.AddActor(self.shape_actor)
+        self.update_shape()
+
+    def update_shape(self):
+        self.shape_polydata.ShallowCopy(self.simulation.shape_polydata)
+        self.shape_polydata.Modified()
+        aircraft = self.simulation.shape == 'aircraft'
+        self.shape_actor.GetProperty().SetSpecular(0.5 if aircraft else 0.0)
+        self.shape_actor.GetProperty().SetSpecularPower(30 if aircraft else 1.0)
 
     def create_incoming_waves(self):
-        points = vtk.vtkPoints()
-        lines = vtk.vtkCellArray()
-        for i in range(self.num_points):
-            theta = np.random.uniform(0, 2 * np.pi)
-            phi = np.random.uniform(0, np.pi)
-            x = -self.size * np.sin(phi) * np.cos(theta)
-            y = -self.size * np.sin(phi) * np.sin(theta)
-            z = -self.size * np.cos(phi)
-            tx = np.random.uniform(-self.size, self.size)
-            ty = np.random.uniform(-self.size, self.size)
-            tz = np.random.uniform(-self.size, self.size)
-            points.InsertNextPoint(x, y, z)
-            points.InsertNextPoint(tx, ty, tz)
-            line = vtk.vtkLine()
-            line.GetPointIds().SetId(0, i * 2)
-            line.GetPointIds().SetId(1, i * 2 + 1)
-            lines.InsertNextCell(line)
-        lines_poly_data = vtk.vtkPolyData()
-        lines_poly_data.SetPoints(points)
-        lines_poly_data.SetLines(lines)
-        lines_mapper = vtk.vtkPolyDataMapper()
-        lines_mapper.SetInputData(lines_poly_data)
-        lines_actor = vtk.vtkActor()
-        lines_actor.SetMapper(lines_mapper)
-        lines_actor.GetProperty().SetColor(0, 1, 1)
-        lines_actor.GetProperty().SetLineWidth(2)
-        self.renderer.AddActor(lines_actor)
+        self.incoming_polydata = vtk.vtkPolyData()
+        self.renderer.AddActor(lines_actor(self.incoming_polydata, (0, 1, 1)))
+        self.update_incoming_waves()
+
+    def update_incoming_waves(self):
+        set_line_segments(self.incoming_polydata, *incoming_segments(self.simulation))
 
     def create_scattered_waves(self):
-        points = vtk.vtkPoints()
-        lines = vtk.vtkCellArray()
-        for i in range(self.num_points):
-            theta = np.random.uniform(0, 2 * np.pi)
-            phi = np.random.uniform(0, np.pi)
-            x = -self.size * np.sin(phi) * np.cos(theta)
-            y = -self.size * np.sin(phi) * np.sin(theta)
-            z = -self.size * np.cos(phi)
-            tx = np.random.uniform(-self.size, self.size)
-            ty = np.random.uniform(-self.size, self.size)
-            tz = np.random.uniform(-self.size, self.size)
-            normal = np.array([0, 0, 1])
-            incoming = np.array([x, y, z])
-            reflection = incoming - 2 * np.dot(incoming, normal) * normal
-            reflection *= -1
-            points.InsertNextPoint(tx, ty, tz)
-            points.InsertNextPoint(reflection[0], reflection[1], reflection[2])
-            line = vtk.vtkLine()
-            line.GetPointIds().SetId(0, i * 2)
-            line.GetPointIds().SetId(1, i * 2 + 1)
-            lines.InsertNextCell(line)
-        lines_poly_data = vtk.vtkPolyData()
-        lines_poly_data.SetPoints(points)
-        lines_poly_data.SetLines(lines)
-        lines_mapper = vtk.vtkPolyDataMapper()
-        lines_mapper.SetInputData(lines_poly_data)
-        lines_actor = vtk.vtkActor()
-        lines_actor.SetMapper(lines_mapper)
-        lines_actor.GetProperty().SetColor(0, 0, 1)
-        lines_actor.GetProperty().SetLineWidth(2)
-        self.renderer.AddActor(lines_actor)
+        self.scattered_polydata = vtk.vtkPolyData()
+        self.renderer.AddActor(lines_actor(self.scattered_polydata, (0, 0, 1)))
+        self.update_scattered_waves()
+
+    def update_scattered_waves(self):
+        set_line_segments(self.scattered_polydata, *scattered_segments(self.simulation))
+
+    def create_heatmap(self, histogram=None):
+        self.heatmap_polydata = vtk.vtkPolyData()
+        self.renderer.AddActor(heatmap_actor(self.heatmap_polydata))
+        self.update_heatmap(histogram)
+
+    def update_heatmap(self, histogram=None):
+        """
+        Show where the reflections of all rays head, on a sphere around the scene.
+
+        Parameters:
+        histogram (array): Direction histogram of HEATMAP_BINS already computed,
+            e.g. by compute_simulation; binned from the simulation if omitted.
+        """
+        simulation = self.simulation
+        if histogram is None:
+            histogram = simulation.scattered_direction_histogram(HEATMAP_BINS)
+        set_sphere_heatmap(self.heatmap_polydata, histogram, 1.2 * simulation.launch_radius())
+
+    def calculate_reflection_percentage(self, tolerance=REFLECTION_TOLERANCE, max_samples=REFLECTION_SAMPLES):
+        percentage, interval, _ = self.simulation.ground_hit_percentage(tolerance, max_samples=max_samples)
+        self.display_reflection_percentage(percentage, interval)
+
+    def display_reflection_percentage(self, percentage, interval):
+        if getattr(self, 'text_actor', None) is None:
+            self.text_actor = vtk.vtkTextActor()
+            self.text_actor.GetTextProperty().SetFontSize(24)
+            self.text_actor.GetTextProperty().SetColor(1.0, 1.0, 1.0)
+            self.renderer.AddActor(self.text_actor)
+        low, high = interval
+        self.text_actor.SetInput(f"Ground Hit Percentage: {percentage:.2f}% (95% CI {low:.2f}-{high:.2f}%)")
+        self.text_actor.SetPosition(10, self.render_window.GetSize()[1] - 40)
+
+    def display_profile(self):
+        """Show the stage timings and counters below the ground-hit readout."""
+        if getattr(self, 'profile_actor', None) is None:
+            self.profile_actor = vtk.vtkTextActor()
+            self.profile_actor.GetTextProperty().SetFontSize(12)
+            self.profile_actor.GetTextProperty().SetFontFamilyToCourier()
+            self.profile_actor.GetTextProperty().SetColor(1.0, 1.0, 1.0)
+            self.profile_actor.GetTextProperty().SetVerticalJustificationToTop()
+            self.renderer.AddActor(self.profile_actor)
+        self.profile_actor.SetInput(profiling.profiler.summary())
+        self.profile_actor.SetPosition(10, self.render_window.GetSize()[1] - 50)
 
     def update_simulation(self, shape=None, size=None, frequency=None, num_points=None):
-        if shape:
-            self.shape = shape
-        if size:
-            self.size = size
-        if frequency:
-            self.frequency = frequency
-            self.wavelength = 3e8 / frequency
-        if num_points:
-            self.num_points = num_points
-        self.renderer.RemoveAllViewProps()
-        self.create_shape()
-        self.create_incoming_waves()
-        self.create_scattered_waves()
-        self.render_window.Render()
+        with profiling.stage('update_simulation'):
+            stages = self.simulation.update(shape, size, frequency, num_points)
+        self.refresh(stages)
+
+    def swap_simulation(self, simulation, stages, reflection=None, histogram=None):
+        """Show a simulation computed elsewhere, e.g. by compute_simulation on a worker thread."""
+        self.simulation = simulation
+        self.refresh(stages, reflection, histogram)
+
+    def refresh(self, stages, reflection=None, histogram=None):
+        """Refill the VTK buffers of the recomputed stages and render."""
+        if 'geometry' in stages:
+            self.update_shape()
+        if stages & {'geometry', 'materials'}:
+            if reflection is None:
+                self.calculate_reflection_percentage()
+            else:
+                self.display_reflection_percentage(*reflection)
+        if 'rays' in stages:
+            self.update_incoming_waves()
+        if 'scattering' in stages:
+            self.update_scattered_waves()
+            self.update_heatmap(histogram)
+        if stages:
+            if profiling.enabled():
+                self.display_profile()
+            with profiling.stage('render'):
+                self.render_window.Render()
 
 def main():
+    # The window's modules are only needed here, so the viewer class can be
+    # imported for batch rendering without loading Tk.
+    import hashlib
+    import queue
+    import re
+    import threading
+    import tkinter as tk
+    from tkinter import ttk
+
     root = tk.Tk()
     root.title("Radar Simulation Parameters")
-    root.geometry("400x300")
+    root.geometry("400x360")
     root.configure(bg="#34495E")
 
     style = ttk.Style()
@@ -291,27 +398,102 @@ def main():
     num_points_entry = ttk.Entry(main_frame, textvariable=num_points_var)
     num_points_entry.grid(row=3, column=1, padx=5, pady=5)
 
-    simulation = [None]
+    # The simulation runs on a worker thread that reports through `events`;
+    # the Tk loop polls the queue, pumps the VTK window's events and does
+    # the final buffer swap, so neither window freezes during a run.
+    state = {'viewer': None, 'job': 0, 'cancel': None}
+    events = queue.Queue()
+
+    def work(job, cancel, simulation, parameters):
+        def progress(stage, done, total):
+            if cancel.is_set():
+                raise Cancelled()
+            events.put(('progress', job, stage, done, total))
+
+        try:
+            result = compute_simulation(simulation, *parameters, progress=progress)
+        except Cancelled:
+            events.put(('cancelled', job))
+        except Exception as error:
+            events.put(('error', job, error))
+        else:
+            events.put(('done', job) + result)
 
     def on_submit():
-        shape = shape_var.get()
-        size = float(size_var.get())
-        frequency = float(freq_var.get())
-        num_points = int(num_points_var.get())
-        if simulation[0] is None:
-            simulation[0] = RadarWaveScatteringSimulation(shape, size, frequency, num_points)
-        else:
-            simulation[0].update_simulation(shape, size, frequency, num_points)
+        try:
+            parameters = (shape_var.get(), float(size_var.get()), float(freq_var.get()), int(num_points_var.get()))
+        except ValueError as error:
+            status_var.set(f"Invalid parameters: {error}")
+            return
+        state['job'] += 1
+        state['cancel'] = threading.Event()
+        viewer = state['viewer']
+        simulation = None if viewer is None else viewer.simulation
+        threading.Thread(target=work, args=(state['job'], state['cancel'], simulation, parameters), daemon=True).start()
+        submit_button.state(['disabled'])
+        status_var.set("Starting...")
 
     def on_cancel():
-        root.destroy()
+        if state['cancel'] is not None:
+            state['cancel'].set()
+            status_var.set("Cancelling...")
+        else:
+            root.destroy()
+
+    def on_viewer_closed(*args):
+        state['viewer'].render_window.Finalize()
+        state['viewer'] = None
+
+    def finish(message):
+        state['cancel'] = None
+        submit_button.state(['!disabled'])
+        progress_var.set(0)
+        status_var.set(message)
+
+    def poll():
+        while True:
+            try:
+                event = events.get_nowait()
+            except queue.Empty:
+                break
+            kind, job = event[:2]
+            if job != state['job']:
+                continue
+            if kind == 'progress':
+                stage, done, total = event[2:]
+                progress_var.set(100 * done / max(total, 1))
+                status_var.set(f"{stage.replace('_', ' ')}: {done:,}/{total:,}")
+            elif kind == 'done':
+                simulation, stages, reflection, histogram = event[2:]
+                if state['viewer'] is None:
+                    state['viewer'] = RadarWaveScatteringSimulation(simulation=simulation, reflection=reflection,
+                                                                    histogram=histogram, show=False)
+                    state['viewer'].render_window_interactor.AddObserver('ExitEvent', on_viewer_closed)
+                    state['viewer'].start()
+                else:
+                    state['viewer'].swap_simulation(simulation, stages, reflection, histogram)
+                finish("Done")
+            elif kind == 'cancelled':
+                finish("Cancelled")
+            else:
+                finish(f"Failed: {event[2]}")
+        if state['viewer'] is not None:
+            state['viewer'].render_window_interactor.ProcessEvents()
+        root.after(20, poll)
 
     btn_frame = ttk.Frame(main_frame, style="TFrame")
     btn_frame.grid(row=4, column=0, columnspan=2, pady=10)
 
-    ttk.Button(btn_frame, text="Submit", command=on_submit).grid(row=0, column=0, padx=5)
+    submit_button = ttk.Button(btn_frame, text="Submit", command=on_submit)
+    submit_button.grid(row=0, column=0, padx=5)
     ttk.Button(btn_frame, text="Cancel", command=on_cancel).grid(row=0, column=1, padx=5)
 
+    progress_var = tk.DoubleVar(value=0)
+    ttk.Progressbar(main_frame, variable=progress_var, maximum=100).grid(row=5, column=0, columnspan=2, sticky=(tk.W, tk.E))
+    status_var = tk.StringVar(value="")
+    ttk.Label(main_frame, textvariable=status_var).grid(row=6, column=0, columnspan=2, sticky=tk.W)
+
+    root.after(20, poll)
     root.mainloop()
     users = {"admin": hashlib.sha256("admin".encode()).hexdigest()}
 
@@ -406,46 +588,3 @@ def main():
     root.mainloop()
     if __name__ == "__main__":
         main()
-
-    def calculate_reflection_percentage(self):
-        ground_hits = 0
-        for i in range(self.num_points):
-            theta = np.random.uniform(0, 2 * np.pi)
-            phi = np.random.uniform(0, np.pi)
-            x = -self.size * np.sin(phi) * np.cos(theta)
-            y = -self.size * np.sin(phi) * np.sin(theta)
-            z = -self.size * np.cos(phi)
-            normal = np.array([0, 0, 1])
-            incoming = np.array([x, y, z])
-            reflection = incoming - 2 * np.dot(incoming, normal) * normal
-            reflection *= -1
-            if reflection[2] < 0:  # Check if the z-component of the reflection vector is negative
-                ground_hits += 1
-        percentage = (ground_hits / self.num_points) * 100
-        self.display_reflection_percentage(percentage)
-
-    def display_reflection_percentage(self, percentage):
-        text_actor = vtk.vtkTextActor()
-        text_actor.SetInput(f"Ground Hit Percentage: {percentage:.2f}%")
-        text_actor.GetTextProperty().SetFontSize(24)
-        text_actor.GetTextProperty().SetColor(1.0, 1.0, 1.0)
-        text_actor.SetPosition(10, self.render_window.GetSize()[1] - 40)
-        self.renderer.AddActor2D(text_actor)
-        self.render_window.Render()
-
-    def update_simulation(self, shape=None, size=None, frequency=None, num_points=None):
-        if shape:
-            self.shape = shape
-        if size:
-            self.size = size
-        if frequency:
-            self.frequency = frequency
-            self.wavelength = 3e8 / frequency
-        if num_points:
-            self.num_points = num_points
-        self.renderer.RemoveAllViewProps()
-        self.create_shape()
-        self.create_incoming_waves()
-        self.create_scattered_waves()
-        self.render_window.Render()
-        self.calculate_reflection_percentage()
@@ -0,0 +1,145 @@
+import numpy as np
+from geometry import shape_parts
+
+SPEED_OF_LIGHT = 3e8
+
+# Every material is tabulated on the same grids: log-spaced frequencies from
+# 100 MHz to 100 GHz and incidence angles in whole degrees.
+FREQUENCIES = np.geomspace(1e8, 1e11, 121)
+ANGLES = np.linspace(0.0, 90.0, 91)
+
+
+def layer_reflection(frequencies, angles, permittivity, permeability=1.0, thickness=None):
+    """
+    Reflection coefficient of a material layer backed by a perfect conductor.
+
+    Plane-wave (TE) transmission-line model: the layer's input impedance
+    j Z1 tan(k1 d) is matched against free space. Without a thickness the
+    material is a half-space and the plain Fresnel coefficient is returned.
+
+    Parameters:
+    frequencies (array): Frequencies in Hz.
+    angles (array): Incidence angles in degrees from the normal.
+    permittivity, permeability (complex): Relative material constants, with
+        negative imaginary parts for loss.
+    thickness (float): Layer thickness in metres, a half-space if None.
+
+    Returns:
+    array: Complex coefficients of shape (len(frequencies), len(angles)).
+    """
+    sines = np.sin(np.radians(angles))
+    index = np.sqrt(permittivity * permeability + 0j)
+    cos_free = np.cos(np.radians(angles))
+    cos_layer = np.sqrt(1 - (sines / index) ** 2)
+    # TE wave impedances relative to free space.
+    free = 1 / np.maximum(cos_free, 1e-9)
+    layer = np.sqrt(permeability / (permittivity + 0j)) / cos_layer
+    if thickness is None:
+        impedance = np.broadcast_to(layer, (len(frequencies), len(angles)))
+    else:
+        wavenumber = 2 * np.pi * np.asarray(frequencies)[:, None] / SPEED_OF_LIGHT
+        impedance = 1j * layer * np.tan(wavenumber * index * cos_layer * thickness)
+    return (impedance - free) / (impedance + free)
+
+
+class Material:
+    """
+    Reflection coefficients of a surface tabulated over frequency and incidence angle.
+
+    Parameters:
+    name (str): Material name.
+    coefficients (array): Complex coefficients of shape (len(frequencies), len(ANGLES)).
+    frequencies (array): Increasing tabulated frequencies in Hz.
+    """
+
+    def __init__(self, name, coefficients, frequencies=FREQUENCIES):
+        self.name = name
+        self.frequencies = np.asarray(frequencies, dtype=float)
+        self.coefficients = np.asarray(coefficients, dtype=complex).reshape(len(self.frequencies), len(ANGLES))
+
+    @classmethod
+    def conductor(cls, name='metal'):
+        return cls(name, np.full((len(FREQUENCIES), len(ANGLES)), -1.0 + 0j))
+
+    @classmethod
+    def layer(cls, name, permittivity, permeability=1.0, thickness=None):
+        """Tabulate layer_reflection for a coating on metal, or a half-space without thickness."""
+        return cls(name, layer_reflection(FREQUENCIES, ANGLES, permittivity, permeability, thickness))
+
+    def at(self, frequency):
+        """Coefficients over ANGLES at one frequency, interpolated in log-frequency and clamped to the table."""
+        position = np.interp(np.log(frequency), np.log(self.frequencies), np.arange(len(self.frequencies)))
+        below = min(int(position), len(self.frequencies) - 2)
+        weight = position - below
+        return (1 - weight) * self.coefficients[below] + weight * self.coefficients[below + 1]
+
+
+MATERIALS = {
+    'metal': Material.conductor(),
+    # Magnetically loaded absorber paint, tuned to below -20 dB at 10 GHz and normal incidence.
+    'ram': Material.layer('ram', 7.0 - 0.5j, 1.6 - 1.9j, 1.6e-3),
+    # Dielectric canopy and radome material, treated as a half-space.
+    'glass': Material.layer('glass', 6.0 - 0.05j),
+}
+
+
+def material_table(names, materials):
+    """
+    Materials of a list of parts.
+
+    Parameters:
+    names (tuple): Part names, e.g. from geometry.shape_parts.
+    materials (str or dict): One material for every part, or materials by
+        part name; a material is a Material or a key of MATERIALS, and parts
+        left out are metal.
+
+    Returns:
+    list: One Material per part.
+    """
+    if not isinstance(materials, dict):
+        materials = dict.fromkeys(names, materials)
+    unknown = set(materials) - set(names)
+    if unknown:
+        raise ValueError(f"Unknown parts {sorted(unknown)}; expected some of {list(names)}")
+    chosen = [materials.get(name, 'metal') for name in names]
+    return [MATERIALS[material] if isinstance(material, str) else material for material in chosen]
+
+
+class MaterialMap:
+    """
+    Per-face reflection coefficients at one frequency, usable as the
+    `reflectivity` of sbr.trace_bounces and rcs.monostatic_rcs.
+
+    The tables of all parts are resampled to the frequency once; a call then
+    interpolates in incidence angle for a whole batch of hits with a few
+    array gathers.
+
+    Given an array of frequencies, the map covers a whole sweep and returns
+    one row of coefficients per frequency.
+
+    Parameters:
+    face_parts (array): Part id of every face.
+    materials (list): Material of every part id.
+    frequency (float or array): Radar frequency in Hz, or the frequencies of a sweep.
+    """
+
+    def __init__(self, face_parts, materials, frequency):
+        self.face_parts = np.asarray(face_parts, dtype=np.intp)
+        self.materials = [material.name for material in materials]
+        self.frequency = frequency
+        # Shape (parts, angles), with a leading frequency axis for a sweep.
+        tables = [np.stack([material.at(f) for material in materials]) for f in np.atleast_1d(frequency)]
+        self.table = np.stack(tables) if np.ndim(frequency) else tables[0]
+
+    def __call__(self, faces, cosines):
+        position = np.degrees(np.arccos(np.clip(cosines, 0.0, 1.0))) / (ANGLES[1] - ANGLES[0])
+        below = np.minimum(position.astype(np.intp), len(ANGLES) - 2)
+        weight = position - below
+        flat = self.table.reshape(self.table.shape[:-2] + (-1,))
+        start = self.face_parts[faces] * len(ANGLES) + below
+        return (1 - weight) * flat[..., start] + weight * flat[..., start + 1]
+
+
+def material_map(shape, face_parts, materials, frequency):
+    """MaterialMap for a shape's faces, see material_table for `materials`."""
+    return MaterialMap(face_parts, material_table(shape_parts(shape), materials), frequency)
@@ -0,0 +1,250 @@
+import os
+import numpy as np
+
+MESH_EXTENSIONS = ('.stl', '.obj', '.ply')
+
+# Binary STL: 80-byte header, uint32 triangle count, then packed 50-byte records.
+STL_RECORD = np.dtype([('normal', '<f4', (3,)), ('corners', '<f4', (3, 3)), ('attribute', '<u2')])
+
+# Largest mesh handed to the renderer; bigger imports are shown decimated.
+DISPLAY_TRIANGLES = 200000
+
+_PLY_TYPES = {
+    'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2', 'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4', 'double': 'f8', 'float64': 'f8',
+}
+
+
+def is_mesh_file(shape):
+    return isinstance(shape, str) and os.path.splitext(shape)[1].lower() in MESH_EXTENSIONS
+
+
+def read_stl(path):
+    """
+    Triangle corners of an STL file, shape (m, 3, 3).
+
+    Binary files are memory-mapped as an array of packed records, so no
+    triangle is parsed individually; the returned array is a view into the map.
+    """
+    with open(path, 'rb') as handle:
+        header = handle.read(84)
+    if len(header) == 84:
+        count = int(np.frombuffer(header, '<u4', 1, 80)[0])
+        if os.path.getsize(path) == 84 + count * STL_RECORD.itemsize:
+            if count == 0:
+                return np.empty((0, 3, 3), dtype=np.float32)
+            return np.memmap(path, dtype=STL_RECORD, mode='r', offset=84, shape=(count,))['corners']
+    with open(path) as handle:
+        tokens = handle.read().split()
+    values = [tokens[index + axis] for index, token in enumerate(tokens) if token == 'vertex' for axis in (1, 2, 3)]
+    return np.array(values, dtype=np.float64).reshape(-1, 3, 3)
+
+
+def read_obj(path):
+    """Vertices and triangles of a Wavefront OBJ file; polygons are split into fans."""
+    vertices, faces = [], []
+    with open(path) as handle:
+        for line in handle:
+            if line.startswith('v '):
+                vertices.append(line.split()[1:4])
+            elif line.startswith('f '):
+                # Entries look like 'v', 'v/vt', 'v//vn' or 'v/vt/vn'; negative
+                # indices count back from the last vertex read so far.
+                indices = [int(entry.split('/')[0]) for entry in line.split()[1:]]
+                indices = [index - 1 if index > 0 else len(vertices) + index for index in indices]
+                faces.extend((indices[0], indices[k], indices[k + 1]) for k in range(1, len(indices) - 1))
+    return np.array(vertices, dtype=np.float64).reshape(-1, 3), np.array(faces, dtype=np.int64).reshape(-1, 3)
+
+
+def _read_ply_header(handle):
+    if handle.readline().strip() != b'ply':
+        raise ValueError("Not a PLY file")
+    fmt, elements = None, []
+    while True:
+        words = handle.readline().split()
+        if not words or words[0] == b'end_header':
+            break
+        if words[0] == b'format':
+            fmt = words[1].decode()
+        elif words[0] == b'element':
+            elements.append((words[1].decode(), int(words[2]), []))
+        elif words[0] == b'property':
+            elements[-1][2].append([word.decode() for word in words[1:]])
+    return fmt, elements
+
+
+def read_ply(path):
+    """Vertices and triangles of an ASCII or binary PLY file; polygons are split into fans."""
+    with open(path, 'rb') as handle:
+        fmt, elements = _read_ply_header(handle)
+        binary = fmt != 'ascii'
+        order = '>' if fmt == 'binary_big_endian' else '<'
+        vertices = np.empty((0, 3))
+        triangles = np.empty((0, 3), dtype=np.int64)
+        lines = None if binary else iter(handle.read().decode().splitlines())
+        for name, count, properties in elements:
+            is_list = any(prop[0] == 'list' for prop in properties)
+            if not is_list:
+                dtype = np.dtype([(prop[-1], order + _PLY_TYPES[prop[0]]) for prop in properties])
+                if binary:
+                    data = np.frombuffer(handle.read(count * dtype.itemsize), dtype)
+                else:
+                    rows = [next(lines).split() for _ in range(count)]
+                    data = np.array([tuple(row) for row in rows], dtype=[(field, 'f8') for field in dtype.names])
+                if name == 'vertex':
+                    vertices = np.column_stack([data['x'], data['y'], data['z']]).astype(np.float64)
+            elif name == 'face' and len(properties) == 1:
+                _, count_type, index_type, _ = properties[0]
+                polygons = _read_ply_faces(handle, lines, count, order + _PLY_TYPES[count_type],
+                                           order + _PLY_TYPES[index_type], binary)
+                triangles = np.concatenate([polygons[:, [0, k, k + 1]] for k in range(1, polygons.shape[1] - 1)]
+                                           ) if len(polygons) else triangles
+            else:
+                raise ValueError(f"Unsupported PLY element: {name}")
+    return vertices, triangles.astype(np.int64)
+
+
+def _read_ply_faces(handle, lines, count, count_type, index_type, binary):
+    """Face index lists as one (m, k) array when every face has k corners, else fan-split rows."""
+    if not binary:
+        faces = [[int(word) for word in next(lines).split()[1:]] for _ in range(count)]
+    else:
+        # Triangle-only files are read in one go as fixed-size records;
+        # anything else falls back to reading face by face.
+        start = handle.tell()
+        record = np.dtype([('count', count_type), ('indices', index_type, (3,))])
+        data = np.frombuffer(handle.read(count * record.itemsize), record)
+        if len(data) == count and np.all(data['count'] == 3):
+            return data['indices'].astype(np.int64)
+        handle.seek(start)
+        count_size, index_size = np.dtype(count_type).itemsize, np.dtype(index_type).itemsize
+        faces = []
+        for _ in range(count):
+            corners = int(np.frombuffer(handle.read(count_size), count_type)[0])
+            faces.append(np.frombuffer(handle.read(corners * index_size), index_type).tolist())
+    if faces and all(len(face) == len(faces[0]) for face in faces):
+        return np.array(faces, dtype=np.int64)
+    return np.array([(face[0], face[k], face[k + 1]) for face in faces for k in range(1, len(face) - 1)],
+                    dtype=np.int64).reshape(-1, 3)
+
+
+def weld_vertices(vertices, triangles, tolerance=0.0):
+    """
+    Merge coincident vertices and drop the triangles that collapse.
+
+    Parameters:
+    vertices (array): Vertex coordinates of shape (n, 3).
+    triangles (array): Vertex indices of shape (m, 3).
+    tolerance (float): Vertices closer than this (on a grid of this spacing)
+        are merged; only exact duplicates if 0.
+
+    Returns:
+    tuple: Welded vertices and triangles.
+    """
+    keys = np.asarray(vertices, dtype=np.float64)
+    if tolerance > 0:
+        keys = np.round(keys / tolerance)
+    _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    triangles = inverse.reshape(-1)[triangles]
+    keep = (triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2]) & (triangles[:, 0] != triangles[:, 2])
+    return np.asarray(vertices, dtype=np.float64)[first], triangles[keep]
+
+
+def load_mesh(path, tolerance=0.0):
+    """
+    Read a binary or ASCII STL, OBJ or PLY file into a welded triangle mesh.
+
+    Returns:
+    tuple: Vertices (float64, shape (n, 3)) and triangles (int64, shape (m, 3)).
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.stl':
+        corners = read_stl(path)
+        vertices, triangles = corners.reshape(-1, 3), np.arange(3 * len(corners)).reshape(-1, 3)
+    elif extension == '.obj':
+        vertices, triangles = read_obj(path)
+    elif extension == '.ply':
+        vertices, triangles = read_ply(path)
+    else:
+        raise ValueError(f"Unsupported mesh format: {extension}")
+    return weld_vertices(vertices, triangles, tolerance)
+
+
+def fit_to_size(vertices, size):
+    """Center a mesh on the origin and scale it uniformly to fill [-size, size]^3."""
+    lower, upper = vertices.min(axis=0), vertices.max(axis=0)
+    half_extent = 0.5 * np.max(upper - lower)
+    return (vertices - 0.5 * (lower + upper)) * (size / half_extent if half_extent > 0 else 1.0)
+
+
+def cluster_vertices(vertices, triangles, cell_size):
+    """
+    Simplify a mesh by vertex clustering.
+
+    Vertices falling in the same cubic cell are replaced by their mean;
+    triangles that collapse or become duplicates are removed.
+
+    Returns:
+    tuple: Simplified vertices and triangles.
+    """
+    cells = np.floor((vertices - vertices.min(axis=0)) / cell_size).astype(np.int64)
+    _, cluster = np.unique(cells, axis=0, return_inverse=True)
+    cluster = cluster.reshape(-1)
+    counts = np.bincount(cluster)
+    merged = np.column_stack([np.bincount(cluster, vertices[:, axis]) for axis in range(3)]) / counts[:, None]
+    triangles = cluster[triangles]
+    keep = (triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2]) & (triangles[:, 0] != triangles[:, 2])
+    triangles = triangles[keep]
+    _, unique = np.unique(np.sort(triangles, axis=1), axis=0, return_index=True)
+    return merged, triangles[np.sort(unique)]
+
+
+def lod_levels(vertices, triangles, levels=4, reduction=4, min_triangles=500):
+    """
+    Successively coarser versions of a mesh.
+
+    Each level has about `reduction` times fewer triangles than the previous
+    one. A surface clustered with cell size h keeps about
+    density * area / h^2 triangles, so the cell size for a target count n is
+    sqrt(density * area / n). The density starts at 2, two triangles per
+    occupied cell, and is re-measured after every clustering. While the count
+    misses its target by more than a factor reduction ** 0.1, the level is
+    clustered again with the corrected cell size, at most three times.
+
+    Returns:
+    list: (vertices, triangles) per level, finest (the input) first.
+    """
+    result = [(vertices, triangles)]
+    if len(triangles) == 0:
+        return result
+    diagonal = np.linalg.norm(vertices.max(axis=0) - vertices.min(axis=0))
+    area = 0.5 * np.linalg.norm(np.cross(vertices[triangles[:, 1]] - vertices[triangles[:, 0]],
+                                         vertices[triangles[:, 2]] - vertices[triangles[:, 0]]), axis=1).sum()
+    tolerance = 0.1 * np.log(reduction)
+    density = 2.0
+    while len(result) <= levels and len(result[-1][1]) > min_triangles:
+        target = len(result[-1][1]) / reduction
+        for _ in range(3):
+            cell_size = max(np.sqrt(density * area / target), 1e-9 * diagonal)
+            coarse = cluster_vertices(vertices, triangles, cell_size)
+            if len(coarse[1]) == 0:
+                break
+            density = len(coarse[1]) * cell_size ** 2 / area
+            if abs(np.log(len(coarse[1]) / target)) <= tolerance:
+                break
+        if not 0 < len(coarse[1]) < len(result[-1][1]):
+            break
+        result.append(coarse)
+    return result
+
+
+def display_mesh(vertices, triangles, max_triangles=DISPLAY_TRIANGLES):
+    """The finest level of detail with at most `max_triangles` triangles."""
+    if len(triangles) <= max_triangles:
+        return vertices, triangles
+    for level in lod_levels(vertices, triangles, levels=8)[1:]:
+        if len(level[1]) <= max_triangles:
+            return level
+    return level
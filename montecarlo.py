@@ -0,0 +1,106 @@
+from statistics import NormalDist
+import numpy as np
+
+
+def _sobol_direction_numbers():
+    first = np.array([1 << (31 - bit) for bit in range(32)], dtype=np.uint64)
+    second = np.empty(32, dtype=np.uint64)
+    second[0] = 1 << 31
+    for bit in range(1, 32):
+        second[bit] = second[bit - 1] ^ (second[bit - 1] >> np.uint64(1))
+    return np.stack([first, second], axis=1)
+
+
+_SOBOL_DIRECTIONS = _sobol_direction_numbers()
+
+
+def sobol_2d(count, start=0, shift=None):
+    """
+    Points of the two-dimensional Sobol sequence.
+
+    Parameters:
+    count (int): Number of points.
+    start (int): Index of the first point, so consecutive calls continue the sequence.
+    shift (array): Optional pair of 32-bit digital shifts (random scrambling).
+
+    Returns:
+    array: Points in [0, 1)^2 of shape (count, 2).
+    """
+    index = np.arange(start, start + count, dtype=np.uint64)
+    gray = index ^ (index >> np.uint64(1))
+    values = np.zeros((count, 2), dtype=np.uint64)
+    for bit in range(32):
+        set_bit = ((gray >> np.uint64(bit)) & np.uint64(1)).astype(bool)
+        values[set_bit] ^= _SOBOL_DIRECTIONS[bit]
+    if shift is not None:
+        values ^= np.asarray(shift, dtype=np.uint64)
+    return values / 2.0 ** 32
+
+
+def make_sampler(kind, rng):
+    """
+    Source of points in the unit square for direction sampling.
+
+    Parameters:
+    kind (str): 'random' (pseudo-random), 'stratified' (one point per stratum
+        and dimension in every chunk) or 'sobol' (randomly shifted Sobol sequence).
+    rng (numpy.random.Generator): Generator used for all randomness.
+
+    Returns:
+    callable: f(count, start) returning points of shape (count, 2).
+    """
+    if kind == 'random':
+        return lambda count, start: rng.random((count, 2))
+    if kind == 'stratified':
+        def stratified(count, start):
+            strata = np.stack([rng.permutation(count), rng.permutation(count)], axis=1)
+            return (strata + rng.random((count, 2))) / count
+        return stratified
+    if kind == 'sobol':
+        shift = rng.integers(0, 2 ** 32, size=2, dtype=np.uint64)
+        return lambda count, start: sobol_2d(count, start, shift)
+    raise ValueError(f"Unknown sampling: {kind}")
+
+
+def wilson_interval(successes, trials, confidence=0.95):
+    """Wilson score interval for a binomial proportion."""
+    if trials == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    fraction = successes / trials
+    denominator = 1 + z ** 2 / trials
+    center = (fraction + z ** 2 / (2 * trials)) / denominator
+    half_width = z * np.sqrt(fraction * (1 - fraction) / trials + z ** 2 / (4 * trials ** 2)) / denominator
+    return center - half_width, center + half_width
+
+
+def estimate_fraction(indicator, max_samples, tolerance=None, confidence=0.95, chunk_size=65536):
+    """
+    Estimate the probability of an event from vectorized chunks of samples.
+
+    Sampling stops early once the half-width of the confidence interval is at
+    most `tolerance`. For quasi-random samples the binomial interval is a
+    conservative bound.
+
+    Parameters:
+    indicator (callable): f(count, start) returning a boolean array of `count`
+        outcomes, or weights in [0, 1] for a weighted fraction.
+    max_samples (int): Upper bound on the number of samples.
+    tolerance (float): Requested half-width of the interval, run to max_samples if None.
+    confidence (float): Confidence level of the interval.
+    chunk_size (int): Samples evaluated per vectorized call.
+
+    Returns:
+    tuple: Estimated fraction, (low, high) interval and number of samples used.
+    """
+    successes = 0
+    trials = 0
+    low, high = 0.0, 1.0
+    while trials < max_samples:
+        count = min(chunk_size, max_samples - trials)
+        successes += float(np.sum(indicator(count, trials)))
+        trials += count
+        low, high = wilson_interval(successes, trials, confidence)
+        if tolerance is not None and (high - low) / 2 <= tolerance:
+            break
+    return (successes / trials if trials else 0.0), (low, high), trials
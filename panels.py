@@ -0,0 +1,311 @@
+from functools import lru_cache
+import numpy as np
+
+
+def source_velocity(offsets, strengths, cores):
+    """
+    Velocity induced by regularized point sources.
+
+    Parameters:
+    offsets (array): Query point minus source position, shape (..., 3).
+    strengths (array): Source strengths (volume flux), broadcast against offsets[..., 0].
+    cores (array): Regularization radii, same broadcasting.
+
+    Returns:
+    array: Velocities of shape (..., 3).
+    """
+    distance2 = np.einsum('...i,...i->...', offsets, offsets) + cores ** 2
+    return offsets * (strengths / (4 * np.pi * distance2 * np.sqrt(distance2)))[..., None]
+
+
+def aircraft_panels(resolution=60, wing_span=5, wing_width=0.1, length=10, height=1):
+    """
+    Flat panels on the surface sampled by aero.generate_aircraft_model.
+
+    The fuselage grid becomes quadrilaterals, closed at the nose (z = 0) and
+    tail (z = length) by flat caps of ring sectors about as wide as they are
+    deep. The wing grid becomes a single sheet of
+    panels facing upstream; the part inside the fuselage is dropped.
+
+    Parameters:
+    Same as generate_aircraft_model.
+
+    Returns:
+    tuple: Panel centroids, outward unit normals and areas.
+    """
+    theta = np.linspace(0, 2 * np.pi, resolution)
+    z_fuse = np.linspace(0, length, resolution)
+    ring = np.column_stack([height * np.cos(theta), height * np.sin(theta)])
+    grid = np.concatenate([np.broadcast_to(ring, (resolution, resolution, 2)),
+                           np.broadcast_to(z_fuse[:, None, None], (resolution, resolution, 1))], axis=2)
+    quads = [np.stack([grid[:-1, :-1], grid[:-1, 1:], grid[1:, 1:], grid[1:, :-1]], axis=2).reshape(-1, 4, 3)]
+
+    x_wing, y_wing = np.meshgrid(np.linspace(-wing_span, wing_span, resolution // 6),
+                                 np.linspace(-wing_width, wing_width, resolution // 15))
+    wing = np.stack([x_wing, y_wing, np.full_like(x_wing, length / 2)], axis=2)
+    quads.append(np.stack([wing[:-1, :-1], wing[:-1, 1:], wing[1:, 1:], wing[1:, :-1]], axis=2).reshape(-1, 4, 3))
+    quads = np.concatenate(quads)
+
+    centroids = quads.mean(axis=1)
+    normals = 0.5 * np.cross(quads[:, 2] - quads[:, 0], quads[:, 3] - quads[:, 1])
+    inside = np.hypot(centroids[:, 0], centroids[:, 1]) < height * np.cos(np.pi / resolution) - 1e-9
+    on_wing = np.arange(len(quads)) >= (resolution - 1) ** 2
+    keep = ~(on_wing & inside)
+    centroids, normals, on_wing = centroids[keep], normals[keep], on_wing[keep]
+    outward = np.where(on_wing[:, None], [0.0, 0.0, -1.0], np.column_stack([centroids[:, :2], np.zeros(len(centroids))]))
+    normals *= np.where(np.einsum('ij,ij->i', normals, outward) < 0, -1.0, 1.0)[:, None]
+
+    rings = max(1, round((resolution - 1) / (2 * np.pi)))
+    radii = height * np.arange(rings + 1) / rings
+    sectors = np.maximum(3, np.round((resolution - 1) * np.arange(1, rings + 1) / rings)).astype(int)
+    ring_index = np.repeat(np.arange(rings), sectors)
+    step = 2 * np.pi / sectors[ring_index]
+    angle = (np.arange(len(ring_index)) - np.repeat(np.cumsum(sectors) - sectors, sectors) + 0.5) * step
+    inner, outer = radii[ring_index], radii[ring_index + 1]
+    radius = 2 / 3 * (outer ** 3 - inner ** 3) / (outer ** 2 - inner ** 2) * np.sinc(step / (2 * np.pi))
+    cap_areas = 0.5 * (outer ** 2 - inner ** 2) * step
+    for z, direction in ((0.0, -1.0), (length, 1.0)):
+        cap_centroids = np.column_stack([radius * np.cos(angle), radius * np.sin(angle), np.full(len(angle), z)])
+        centroids = np.concatenate([centroids, cap_centroids])
+        normals = np.concatenate([normals, cap_areas[:, None] * [0.0, 0.0, direction]])
+
+    areas = np.linalg.norm(normals, axis=1)
+    keep = areas > 1e-12 * areas.max()
+    return centroids[keep], normals[keep] / areas[keep, None], areas[keep]
+
+
+class SourceTree:
+    """
+    Barnes-Hut hierarchy over point sources for fast velocity evaluation.
+
+    Built like the ray BVH: a complete binary tree in heap layout, split one
+    level at a time at the median along each node's longest axis. Every node
+    keeps its bounding box and its strength moments up to second order, so a
+    distant node acts as a source, dipole and quadrupole about its box center.
+
+    Parameters:
+    positions (array): Source positions of shape (n, 3).
+    strengths (array): Source strengths of shape (n,).
+    cores (array): Regularization radii of shape (n,).
+    leaf_size (int): Maximum number of sources per leaf.
+    """
+
+    def __init__(self, positions, strengths, cores, leaf_size=16):
+        count = len(positions)
+        self.leaf_size = leaf_size
+        num_leaves = max(1, -(-count // leaf_size))
+        self.depth = int(np.ceil(np.log2(num_leaves))) if num_leaves > 1 else 0
+        self.width = 1 << self.depth
+        self.leaf_start = np.arange(self.width + 1) * count // self.width
+
+        order = np.arange(count)
+        slots = np.arange(count)
+        for level in range(self.depth):
+            starts = np.arange(1 << level) * count >> level
+            segment = np.searchsorted(starts, slots, side='right') - 1
+            points = positions[order]
+            extent = np.maximum.reduceat(points, starts) - np.minimum.reduceat(points, starts)
+            axis = np.argmax(extent, axis=1)
+            order = order[np.lexsort((points[slots, axis[segment]], segment))]
+
+        self.positions = positions[order]
+        self.strengths = strengths[order]
+        self.cores = cores[order]
+
+        leaf = np.searchsorted(self.leaf_start, slots, side='right') - 1
+        level_strength = np.bincount(leaf, self.strengths, minlength=self.width)
+        weighted = self.strengths[:, None] * self.positions
+        level_moment = np.column_stack([np.bincount(leaf, weighted[:, axis], minlength=self.width) for axis in range(3)])
+        second = (weighted[:, :, None] * self.positions[:, None, :]).reshape(-1, 9)
+        level_second = np.column_stack([np.bincount(leaf, second[:, k], minlength=self.width) for k in range(9)])
+        level_min = np.full((self.width, 3), np.inf)
+        level_max = np.full((self.width, 3), -np.inf)
+        np.minimum.at(level_min, leaf, self.positions)
+        np.maximum.at(level_max, leaf, self.positions)
+
+        num_nodes = 2 * self.width - 1
+        strength = np.zeros(num_nodes)
+        moment = np.zeros((num_nodes, 3))
+        second = np.zeros((num_nodes, 9))
+        node_min = np.zeros((num_nodes, 3))
+        node_max = np.zeros((num_nodes, 3))
+        first = self.width - 1
+        while True:
+            strength[first:first + len(level_strength)] = level_strength
+            moment[first:first + len(level_moment)] = level_moment
+            second[first:first + len(level_second)] = level_second
+            node_min[first:first + len(level_min)] = level_min
+            node_max[first:first + len(level_max)] = level_max
+            if first == 0:
+                break
+            level_strength = level_strength.reshape(-1, 2).sum(axis=1)
+            level_moment = level_moment.reshape(-1, 2, 3).sum(axis=1)
+            level_second = level_second.reshape(-1, 2, 9).sum(axis=1)
+            level_min = level_min.reshape(-1, 2, 3).min(axis=1)
+            level_max = level_max.reshape(-1, 2, 3).max(axis=1)
+            first = (first - 1) // 2
+
+        # Empty nodes get an infinite radius so they are never accepted as
+        # far field; their leaves hold no sources.
+        empty = ~np.isfinite(node_min).all(axis=1)
+        node_min[empty] = node_max[empty] = 0.0
+        self.center = 0.5 * (node_min + node_max)
+        self.radius = np.where(empty, np.inf, 0.5 * np.linalg.norm(node_max - node_min, axis=1))
+        self.strength = strength
+        self.dipole = moment - strength[:, None] * self.center
+        # Second moment sum(q s s^T) of the offsets s from the center.
+        outer = moment[:, :, None] * self.center[:, None, :]
+        self.quadrupole = (second.reshape(-1, 3, 3) - outer - outer.transpose(0, 2, 1)
+                           + strength[:, None, None] * self.center[:, :, None] * self.center[:, None, :])
+
+    def velocity(self, points, theta=0.5, chunk_size=16384):
+        """
+        Velocity induced by all sources at the query points.
+
+        A node is used as far field when its radius is below `theta` times
+        its distance from the query point; theta = 0 sums every source exactly.
+
+        Parameters:
+        points (array): Query points of shape (n, 3).
+        theta (float): Opening criterion.
+        chunk_size (int): Query points traversed together.
+
+        Returns:
+        array: Velocities of shape (n, 3).
+        """
+        points = np.asarray(points, dtype=np.float64)
+        velocity = np.zeros((len(points), 3))
+        for start in range(0, len(points), chunk_size):
+            velocity[start:start + chunk_size] = self._traverse(points[start:start + chunk_size], theta)
+        return velocity
+
+    def _traverse(self, points, theta):
+        count = len(points)
+        velocity = np.zeros((count, 3))
+        queries = np.arange(count)
+        nodes = np.zeros(count, dtype=np.int64)
+        for level in range(self.depth + 1):
+            offsets = points[queries] - self.center[nodes]
+            distance = np.linalg.norm(offsets, axis=1)
+            far = self.radius[nodes] < theta * distance
+            if np.any(far):
+                self._far_field(velocity, queries[far], nodes[far], offsets[far], distance[far])
+            queries, nodes = queries[~far], nodes[~far]
+            if level < self.depth:
+                queries = np.repeat(queries, 2)
+                nodes = (2 * nodes[:, None] + np.array([1, 2])).ravel()
+        self._near_field(velocity, points, queries, nodes - (self.width - 1))
+        return velocity
+
+    def _far_field(self, velocity, queries, nodes, offsets, distance):
+        # Taylor expansion of r / |r|^3 about the node center up to second order.
+        inverse2 = 1.0 / distance ** 2
+        inverse3 = inverse2 / distance
+        dipole = self.dipole[nodes]
+        quadrupole = self.quadrupole[nodes]
+        projection = np.einsum('ij,ij->i', offsets, dipole) * inverse2
+        quadrupole_offsets = np.einsum('ijk,ik->ij', quadrupole, offsets)
+        contraction = np.einsum('ij,ij->i', offsets, quadrupole_offsets) * inverse2
+        trace = np.einsum('ijj->i', quadrupole)
+        field = (offsets * self.strength[nodes, None]
+                 - dipole + 3 * projection[:, None] * offsets
+                 + (7.5 * contraction - 1.5 * trace)[:, None] * offsets * inverse2[:, None]
+                 - 3 * quadrupole_offsets * inverse2[:, None]) * (inverse3 / (4 * np.pi))[:, None]
+        for axis in range(3):
+            velocity[:, axis] += np.bincount(queries, field[:, axis], minlength=len(velocity))
+
+    def _near_field(self, velocity, points, queries, leaves):
+        pairs_per_block = max(1, (1 << 18) // self.leaf_size)
+        lanes = np.arange(self.leaf_size)
+        for start in range(0, len(queries), pairs_per_block):
+            block_leaves = leaves[start:start + pairs_per_block, None]
+            slots = (self.leaf_start[block_leaves] + lanes).ravel()
+            valid = slots < self.leaf_start[block_leaves + 1].repeat(self.leaf_size, axis=1).ravel()
+            block_queries = np.repeat(queries[start:start + pairs_per_block], self.leaf_size)[valid]
+            slots = slots[valid]
+            field = source_velocity(points[block_queries] - self.positions[slots], self.strengths[slots], self.cores[slots])
+            for axis in range(3):
+                velocity[:, axis] += np.bincount(block_queries, field[:, axis], minlength=len(velocity))
+
+
+class PanelSolver:
+    """
+    Potential flow around a body represented by constant-strength source panels.
+
+    The normal velocity at every panel centroid is required to vanish. The
+    influence matrix is assembled in row blocks of vectorized kernel
+    evaluations and solved once; each panel acts on other panels as a point
+    source whose kernel is regularized over the panel size. The solved
+    sources are then held in a SourceTree so the field can be evaluated at
+    many query points in O(n log n).
+
+    The model is non-lifting: there are no vortex panels and no Kutta
+    condition, and thin sheets such as the wing only block the flow on the
+    side their normals face.
+
+    Parameters:
+    centroids, normals, areas (array): Panels as returned by aircraft_panels.
+    freestream (array): Onset flow velocity.
+    block_size (int): Matrix rows assembled together, chosen from the panel count if omitted.
+    """
+
+    def __init__(self, centroids, normals, areas, freestream=(0.0, 0.0, 1.0), block_size=None):
+        self.centroids = np.asarray(centroids, dtype=np.float64)
+        self.normals = np.asarray(normals, dtype=np.float64)
+        self.areas = np.asarray(areas, dtype=np.float64)
+        self.freestream = np.asarray(freestream, dtype=np.float64)
+        self.cores = 0.5 * np.sqrt(self.areas)
+        count = len(self.centroids)
+        block_size = block_size or max(1, (1 << 21) // max(count, 1))
+
+        # matrix[i, j]: normal velocity at panel i per unit source strength
+        # of panel j. A flat source panel induces half its source density
+        # normal to itself just outside its surface.
+        matrix = np.empty((count, count))
+        for start in range(0, count, block_size):
+            rows = slice(start, start + block_size)
+            offsets = self.centroids[rows, None, :] - self.centroids[None, :, :]
+            field = source_velocity(offsets, 1.0, self.cores)
+            matrix[rows] = np.einsum('ijk,ik->ij', field, self.normals[rows])
+        matrix[np.diag_indices(count)] = 0.5 / self.areas
+        self.strengths = np.linalg.solve(matrix, -self.normals @ self.freestream)
+        self.tree = SourceTree(self.centroids, self.strengths, self.cores)
+
+    def velocity(self, points, theta=0.5):
+        """
+        Flow velocity at arbitrary points.
+
+        Parameters:
+        points (array): Query points of shape (n, 3).
+        theta (float): Barnes-Hut opening criterion, exact summation if 0.
+
+        Returns:
+        array: Velocities of shape (n, 3).
+        """
+        return self.freestream + self.tree.velocity(points, theta)
+
+
+@lru_cache(maxsize=4)
+def aircraft_flow(resolution=60, wing_span=5, wing_width=0.1, length=10, height=1, speed=1.0):
+    """Solved panel flow around the aircraft, with the onset flow along +z (nose to tail)."""
+    return PanelSolver(*aircraft_panels(resolution, wing_span, wing_width, length, height), freestream=(0.0, 0.0, speed))
+
+
+def mesh_flow(vertices, triangles, freestream=(0.0, 0.0, 1.0)):
+    """
+    Solved panel flow around a closed triangle mesh, one panel per triangle.
+
+    Parameters:
+    vertices (array): Vertex coordinates of shape (n, 3).
+    triangles (array): Vertex indices of shape (m, 3), wound counter-clockwise
+        seen from outside so that the normals point out of the body.
+    freestream (array): Onset flow velocity.
+
+    Returns:
+    PanelSolver: The solved flow.
+    """
+    corners = np.asarray(vertices, dtype=np.float64)[np.asarray(triangles)]
+    normals = 0.5 * np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    areas = np.linalg.norm(normals, axis=1)
+    keep = areas > 1e-12 * areas.max()
+    return PanelSolver(corners[keep].mean(axis=1), normals[keep] / areas[keep, None], areas[keep], freestream)
@@ -0,0 +1,146 @@
+import atexit
+import json
+import os
+import time
+import tracemalloc
+from collections import OrderedDict
+from contextlib import nullcontext
+
+_NO_STAGE = nullcontext()
+
+
+class Profiler:
+    """
+    Per-stage wall-clock timers, event counters and optional allocation peaks.
+
+    Stages may nest; a stage's time includes its children and its memory peak
+    is the highest Python/NumPy allocation level reached above the level at
+    which it started, as seen by tracemalloc.
+
+    Parameters:
+    track_allocations (bool): Record per-stage allocation peaks with tracemalloc.
+    """
+
+    def __init__(self, track_allocations=False):
+        self.track_allocations = track_allocations
+        self.stages = OrderedDict()
+        self.counters = OrderedDict()
+        self._memory_stack = []
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + int(amount)
+
+    def reset(self):
+        self.stages.clear()
+        self.counters.clear()
+
+    def results(self):
+        return {'stages': dict(self.stages), 'counters': dict(self.counters)}
+
+    def save(self, path):
+        with open(path, 'w') as handle:
+            json.dump(self.results(), handle, indent=2)
+
+    def summary(self):
+        lines = []
+        for name, stage in self.stages.items():
+            line = f"{name:28s} {stage['time'] * 1e3:10.1f} ms  x{stage['calls']}"
+            if 'peak_memory' in stage:
+                line += f"  {stage['peak_memory'] / 2 ** 20:8.1f} MiB"
+            lines.append(line)
+        for name, value in self.counters.items():
+            lines.append(f"{name:28s} {value:>13,}")
+        return '\n'.join(lines)
+
+    def _start_memory(self):
+        current, peak = tracemalloc.get_traced_memory()
+        if self._memory_stack:
+            self._memory_stack[-1][1] = max(self._memory_stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        self._memory_stack.append([current, current])
+
+    def _stop_memory(self):
+        _, peak = tracemalloc.get_traced_memory()
+        start, seen = self._memory_stack.pop()
+        peak = max(peak, seen)
+        if self._memory_stack:
+            self._memory_stack[-1][1] = max(self._memory_stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        return peak - start
+
+
+class _Stage:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        if self.profiler.track_allocations:
+            self.profiler._start_memory()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        stage = self.profiler.stages.setdefault(self.name, {'calls': 0, 'time': 0.0})
+        stage['calls'] += 1
+        stage['time'] += elapsed
+        if self.profiler.track_allocations:
+            peak = self.profiler._stop_memory()
+            stage['peak_memory'] = max(stage.get('peak_memory', 0), peak)
+        return False
+
+
+profiler = None
+_output = None
+
+
+def enable(track_allocations=False, output=None):
+    """
+    Switch instrumentation on for the rest of the process.
+
+    Parameters:
+    track_allocations (bool): Also record per-stage allocation peaks.
+    output (str): JSON file the results are written to at exit, along with a
+        text summary on stdout.
+    """
+    global profiler, _output
+    profiler = Profiler(track_allocations)
+    if track_allocations and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if output:
+        if _output is None:
+            atexit.register(_report)
+        _output = output
+    return profiler
+
+
+def enabled():
+    return profiler is not None
+
+
+def stage(name):
+    """Context manager timing a named stage; a shared no-op when profiling is off."""
+    if profiler is None:
+        return _NO_STAGE
+    return profiler.stage(name)
+
+
+def count(name, amount=1):
+    """Add to a named counter; does nothing when profiling is off."""
+    if profiler is not None:
+        profiler.count(name, amount)
+
+
+def _report():
+    print(profiler.summary())
+    profiler.save(_output)
+
+
+# HAVEBLUE_PROFILE=1 turns profiling on, HAVEBLUE_PROFILE=memory also
+# tracks allocations; HAVEBLUE_PROFILE_OUTPUT names the JSON report.
+if os.environ.get('HAVEBLUE_PROFILE', '0') not in ('', '0'):
+    enable(os.environ['HAVEBLUE_PROFILE'] == 'memory', os.environ.get('HAVEBLUE_PROFILE_OUTPUT', 'profile.json'))
@@ -0,0 +1,52 @@
+import numpy as np
+
+
+def sample_incoming_rays(num_points, size, rng=None, radius=None, unit_samples=None):
+    """
+    Draw a whole batch of incoming radar rays in one pass.
+
+    Origins lie on a sphere around the shape and targets are spread uniformly
+    over the cube [-size, size]^3, matching the per-ray sampling the
+    simulation used before.
+
+    Parameters:
+    num_points (int): Number of rays to draw.
+    size (float): Scale of the simulated shape.
+    rng (numpy.random.Generator): Random generator, a fresh one if omitted.
+    radius (float): Radius of the origin sphere, `size` if omitted.
+    unit_samples (array): Optional points in [0, 1)^2 of shape (num_points, 2)
+        that place the origins, e.g. from a quasi-random sequence.
+
+    Returns:
+    tuple: Arrays of origins and targets, each of shape (num_points, 3).
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    if unit_samples is None:
+        unit_samples = rng.random((num_points, 2))
+    theta = 2 * np.pi * unit_samples[:, 0]
+    phi = np.pi * unit_samples[:, 1]
+    sin_phi = np.sin(phi)
+    origins = np.empty((num_points, 3))
+    np.multiply(sin_phi, np.cos(theta), out=origins[:, 0])
+    np.multiply(sin_phi, np.sin(theta), out=origins[:, 1])
+    np.cos(phi, out=origins[:, 2])
+    origins *= -(size if radius is None else radius)
+    targets = rng.random((num_points, 3))
+    targets *= 2 * size
+    targets -= size
+    return origins, targets
+
+
+def reflect(vectors, normals):
+    """
+    Mirror a batch of vectors about the planes given by their normals.
+
+    Parameters:
+    vectors (array): Vectors of shape (n, 3).
+    normals (array): Unit normals of shape (n, 3) or (3,).
+
+    Returns:
+    array: Reflected vectors of shape (n, 3).
+    """
+    normals = np.broadcast_to(normals, vectors.shape)
+    return vectors - 2 * np.einsum('ij,ij->i', vectors, normals)[:, None] * normals
@@ -0,0 +1,189 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from multiprocessing import shared_memory
+import numpy as np
+from bvh import BVH
+from sbr import shoot_and_bounce, shoot_and_bounce_sweep
+
+SPEED_OF_LIGHT = 3e8
+
+_worker_bvh = None
+_worker_options = {}
+_worker_blocks = []
+
+
+def angle_grid(start, stop, step):
+    """Inclusive grid of angles in degrees."""
+    return np.arange(start, stop + 0.5 * step, step)
+
+
+def look_directions(azimuths, elevations):
+    """
+    Unit vectors pointing from the target towards the radar.
+
+    Parameters:
+    azimuths (array): Azimuth angles in degrees, measured in the x-y plane from +x.
+    elevations (array): Elevation angles in degrees above the x-y plane.
+
+    Returns:
+    array: Directions of shape (len(elevations), len(azimuths), 3).
+    """
+    azimuth, elevation = np.meshgrid(np.radians(azimuths), np.radians(elevations))
+    return np.stack([np.cos(elevation) * np.cos(azimuth),
+                     np.cos(elevation) * np.sin(azimuth),
+                     np.sin(elevation)], axis=-1)
+
+
+def _first_divided_difference(a, b):
+    # Divided difference of f(x) = -exp(jx), written so it stays exact for a ~ b.
+    return -1j * np.exp(0.5j * (a + b)) * np.sinc((b - a) / (2 * np.pi))
+
+
+def triangle_phase_integrals(phases):
+    """
+    Integral of exp(j * phase) over triangles whose phase varies linearly.
+
+    The integral over a triangle of area A equals 2A times the second divided
+    difference of -exp(jx) at the three vertex phases (Hermite-Genocchi), which
+    is evaluated without cancellation by sorting the phases first.
+
+    Parameters:
+    phases (array): Phase at each vertex, shape (m, 3).
+
+    Returns:
+    array: Complex integrals divided by twice the triangle area, shape (m,).
+    """
+    low, middle, high = np.sort(phases, axis=1).T
+    spread = high - low
+    close = spread < 1e-6
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = (_first_divided_difference(middle, high) - _first_divided_difference(low, middle)) / spread
+    result[close] = 0.5 * np.exp(1j * (low[close] + middle[close] + high[close]) / 3)
+    return result
+
+
+def monostatic_rcs(bvh, directions, wavenumber, reflectivity=None):
+    """
+    Physical-optics monostatic radar cross section of a mesh, perfectly conducting by default.
+
+    Facets are lit when the ray from their centroid towards the radar leaves
+    the mesh without hitting another facet; each lit facet contributes its
+    exact physical-optics surface integral.
+
+    Parameters:
+    bvh (BVH): Hierarchy over the target mesh.
+    directions (array): Unit vectors towards the radar, shape (n, 3).
+    wavenumber (float or array): 2 * pi / wavelength, or one per frequency
+        of a sweep that shares the visibility tests.
+    reflectivity (callable): Optional f(faces, cosines) reflection coefficient
+        scaling each facet's contribution, see sbr.trace_bounces; for a sweep
+        it returns one row of coefficients per wavenumber.
+
+    Returns:
+    array: Radar cross section in square metres, shape (n,), or (n, len(wavenumber)) for a sweep.
+    """
+    wavenumbers = np.atleast_1d(wavenumber)
+    normals = bvh.face_normals[bvh.slot_faces]
+    areas = bvh.face_areas[bvh.slot_faces]
+    centroids = bvh.v0 + (bvh.edge1 + bvh.edge2) / 3
+    lower, upper = bvh.bounds
+    offset = 1e-6 * np.linalg.norm(upper - lower)
+    sigma = np.empty((len(directions), len(wavenumbers)))
+    for i, direction in enumerate(directions):
+        cosines = np.abs(normals @ direction)
+        facing = np.flatnonzero(cosines > 1e-12)
+        _, blocked, _, _ = bvh.intersect(centroids[facing], np.broadcast_to(direction, (len(facing), 3)), t_min=offset)
+        lit = facing[blocked < 0]
+        distances = np.column_stack((bvh.v0[lit] @ direction, bvh.edge1[lit] @ direction, bvh.edge2[lit] @ direction))
+        distances[:, 1:] += distances[:, :1]
+        weights = cosines[lit] * 2 * areas[lit]
+        if reflectivity is not None:
+            weights = weights * np.atleast_2d(reflectivity(bvh.slot_faces[lit], cosines[lit]))
+        weights = np.broadcast_to(weights, (len(wavenumbers), len(lit)))
+        for j, k in enumerate(wavenumbers):
+            amplitude = np.sum(weights[j] * triangle_phase_integrals(2 * k * distances))
+            sigma[i, j] = k ** 2 / np.pi * np.abs(amplitude) ** 2
+    return sigma if np.ndim(wavenumber) else sigma[:, 0]
+
+
+def _share_arrays(arrays):
+    blocks, specs = [], {}
+    for name, array in arrays.items():
+        array = np.require(array, requirements='C')
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        specs[name] = (block.name, array.shape, array.dtype.str)
+    return blocks, specs
+
+
+def _attach_worker(specs, options):
+    global _worker_bvh, _worker_options
+    _worker_options = options
+    arrays = {}
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _worker_blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype, buffer=block.buf)
+    _worker_bvh = BVH.from_arrays(arrays)
+
+
+def _rcs_batch(bvh, directions, wavenumber, method, options):
+    if method == 'po':
+        return monostatic_rcs(bvh, directions, wavenumber, options.get('reflectivity'))
+    if np.ndim(wavenumber):
+        return np.array([shoot_and_bounce_sweep(bvh, direction, wavenumber, **options) for direction in directions])
+    return np.array([shoot_and_bounce(bvh, direction, wavenumber, **options) for direction in directions])
+
+
+def _rcs_task(directions, wavenumber, method):
+    return _rcs_batch(_worker_bvh, directions, wavenumber, method, _worker_options)
+
+
+def rcs_sweep(bvh, frequency, azimuths, elevations, workers=None, method='po', **options):
+    """
+    Monostatic RCS pattern over an azimuth x elevation grid.
+
+    Look angles are split across a process pool. The mesh and its hierarchy
+    are copied once into shared memory that every worker maps, and the
+    options, such as a material map with one entry per face, are sent once
+    per worker when it starts, so tasks only carry their look directions.
+
+    Parameters:
+    bvh (BVH): Hierarchy over the target mesh.
+    frequency (float or array): Radar frequency in Hz, or the frequencies of
+        a sweep; every look angle is then traced once for all of them.
+    azimuths, elevations (array): Look angles in degrees.
+    workers (int): Number of worker processes, all cores if omitted, in-process if 1.
+    method (str): 'po' for facet physical optics, 'sbr' for shooting and bouncing rays.
+    options: Extra keyword arguments for shoot_and_bounce (num_rays, max_bounces,
+        reflectivity, ...); only reflectivity applies to 'po'.
+
+    Returns:
+    array: RCS in dBsm, shape (len(elevations), len(azimuths)), with a
+    leading frequency axis for a sweep.
+    """
+    if method not in ('po', 'sbr'):
+        raise ValueError(f"Unknown RCS method: {method}")
+    # Per-direction rows become (frequency, elevation, azimuth) for a sweep.
+    shape = np.shape(frequency) + (len(elevations), len(azimuths))
+    directions = look_directions(azimuths, elevations).reshape(-1, 3)
+    if len(directions) == 0:
+        return np.empty(shape)
+    wavenumber = 2 * np.pi * np.asarray(frequency, dtype=float) / SPEED_OF_LIGHT
+    workers = workers or os.cpu_count()
+    if workers == 1:
+        sigma = _rcs_batch(bvh, directions, wavenumber, method, options)
+    else:
+        blocks, specs = _share_arrays(bvh.to_arrays())
+        try:
+            chunks = np.array_split(directions, min(len(directions), 4 * workers))
+            with ProcessPoolExecutor(workers, initializer=_attach_worker, initargs=(specs, options)) as pool:
+                results = pool.map(_rcs_task, chunks, repeat(wavenumber), repeat(method))
+                sigma = np.concatenate(list(results))
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+    return 10 * np.log10(np.maximum(sigma.T, 1e-20)).reshape(shape)
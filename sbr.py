@@ -0,0 +1,188 @@
+from collections import namedtuple
+import numpy as np
+from rays import reflect
+
+Bounce = namedtuple('Bounce', ['rays', 'faces', 'points', 'normals', 'incoming', 'outgoing', 'path', 'arriving', 'amplitude'])
+Bounce.__doc__ = """
+One reflection of every ray still alive at a given depth.
+
+rays: index of each ray in the launched batch
+faces, points: hit face and hit point
+normals: unit face normals turned to face the incoming ray
+incoming, outgoing: unit ray directions before and after the reflection
+path: distance travelled from the launch point up to the hit
+arriving: complex amplitude of the ray before the reflection
+amplitude: complex amplitude of the reflected ray
+"""
+
+
+def trace_bounces(bvh, origins, directions, max_bounces=5, energy_threshold=1e-6, reflectivity=None):
+    """
+    Follow a batch of rays through successive specular reflections.
+
+    Each depth re-traces only the rays that are still alive as one shrinking
+    batch: rays that leave the mesh and rays whose energy |amplitude|^2 drops
+    below `energy_threshold` are removed before the next bounce, so the cost
+    follows the number of live rays rather than rays times depth.
+
+    Parameters:
+    bvh (BVH): Hierarchy over the target mesh.
+    origins, directions (array): Launched rays, shape (n, 3).
+    max_bounces (int): Maximum number of reflections per ray.
+    energy_threshold (float): Rays with less remaining energy are dropped.
+    reflectivity (callable): Optional f(faces, cosines) returning the complex
+        reflection coefficient at each hit; perfect mirrors if omitted.
+
+    Yields:
+    Bounce: Hits of the live rays at each depth.
+    """
+    directions = directions / np.linalg.norm(directions, axis=1, keepdims=True)
+    lower, upper = bvh.bounds
+    offset = 1e-6 * np.linalg.norm(upper - lower)
+    rays = np.arange(len(origins))
+    path = np.zeros(len(origins))
+    amplitude = np.ones(len(origins), dtype=complex)
+    for _ in range(max_bounces):
+        if len(rays) == 0:
+            return
+        t, faces, points, normals = bvh.intersect(origins, directions, t_min=offset)
+        hit = faces >= 0
+        rays, faces, points, normals = rays[hit], faces[hit], points[hit], normals[hit]
+        directions, path, amplitude = directions[hit], path[hit] + t[hit], amplitude[hit]
+        cosines = np.einsum('ij,ij->i', directions, normals)
+        normals *= np.where(cosines > 0, -1.0, 1.0)[:, None]
+        outgoing = reflect(directions, normals)
+        arriving = amplitude
+        if reflectivity is not None:
+            amplitude = amplitude * reflectivity(faces, np.abs(cosines))
+        yield Bounce(rays, faces, points, normals, directions, outgoing, path, arriving, amplitude)
+
+        alive = np.abs(amplitude) ** 2 >= energy_threshold
+        rays, path, amplitude = rays[alive], path[alive], amplitude[alive]
+        origins = points[alive] + offset * normals[alive]
+        directions = outgoing[alive]
+
+
+def launch_ray_grid(bvh, direction, num_rays):
+    """
+    Parallel rays arriving from the radar, spread over the mesh's silhouette.
+
+    Parameters:
+    bvh (BVH): Hierarchy over the target mesh.
+    direction (array): Unit vector from the target towards the radar.
+    num_rays (int): Approximate number of rays; a square grid is used.
+
+    Returns:
+    tuple: Ray origins, ray directions, the cross-section area of each ray
+    tube and the distance of the launch plane from the origin along `direction`.
+    """
+    lower, upper = bvh.bounds
+    center = 0.5 * (lower + upper)
+    radius = 0.5 * np.linalg.norm(upper - lower)
+    helper = np.eye(3)[np.argmin(np.abs(direction))]
+    u = np.cross(direction, helper)
+    u /= np.linalg.norm(u)
+    v = np.cross(direction, u)
+    side = max(1, int(np.ceil(np.sqrt(num_rays))))
+    spacing = 2 * radius / side
+    offsets = (np.arange(side) + 0.5) * spacing - radius
+    a, b = np.meshgrid(offsets, offsets)
+    plane_center = center + 2 * radius * direction
+    origins = plane_center + a.reshape(-1, 1) * u + b.reshape(-1, 1) * v
+    directions = np.broadcast_to(-direction, origins.shape).copy()
+    return origins, directions, spacing ** 2, plane_center @ direction
+
+
+def shoot_and_bounce(bvh, direction, wavenumber, num_rays=250000, max_bounces=5, energy_threshold=1e-6, reflectivity=None):
+    """
+    Monostatic radar cross section by shooting and bouncing rays.
+
+    Every ray tube radiates back to the radar from each of its hit points with
+    the physical-optics weight of its footprint, so single-bounce returns match
+    the facet physical-optics result and cavity returns between parts add on
+    top. Hit points that cannot see the radar do not contribute.
+
+    Parameters:
+    bvh (BVH): Hierarchy over the target mesh.
+    direction (array): Unit vector from the target towards the radar.
+    wavenumber (float): 2 * pi / wavelength.
+    num_rays (int): Number of launched rays.
+    max_bounces (int): Maximum reflection depth.
+    energy_threshold (float): Rays with less remaining energy are dropped.
+    reflectivity (callable): Optional reflection coefficient, see trace_bounces.
+
+    Returns:
+    float: Radar cross section in square metres.
+    """
+    origins, directions, tube_area, plane = launch_ray_grid(bvh, direction, num_rays)
+    lower, upper = bvh.bounds
+    offset = 1e-6 * np.linalg.norm(upper - lower)
+    field = 0j
+    for bounce in trace_bounces(bvh, origins, directions, max_bounces, energy_threshold, reflectivity):
+        visible, weight, length = _radar_returns(bvh, bounce, direction, tube_area, plane, offset)
+        field += np.sum(bounce.amplitude[visible] * weight * np.exp(-1j * wavenumber * length))
+    return wavenumber ** 2 / np.pi * np.abs(field) ** 2
+
+
+def _radar_returns(bvh, bounce, direction, tube_area, plane, offset):
+    """Hits of a bounce that see the radar, their footprint weights and their path lengths back to the launch plane."""
+    cos_out = bounce.normals @ direction
+    visible = np.flatnonzero(cos_out > 0)
+    _, blocked, _, _ = bvh.intersect(bounce.points[visible] + offset * bounce.normals[visible],
+                                     np.broadcast_to(direction, (len(visible), 3)), t_min=offset)
+    visible = visible[blocked < 0]
+    cos_in = np.maximum(-np.einsum('ij,ij->i', bounce.incoming[visible], bounce.normals[visible]), 1e-6)
+    weight = tube_area * (cos_in + cos_out[visible]) / (2 * cos_in)
+    length = bounce.path[visible] + plane - bounce.points[visible] @ direction
+    return visible, weight, length
+
+
+def shoot_and_bounce_sweep(bvh, direction, wavenumbers, num_rays=250000, max_bounces=5, reflectivity=None,
+                           block_size=1 << 22):
+    """
+    Monostatic radar cross section by shooting and bouncing rays at many frequencies from one trace.
+
+    The rays are traced once; the hit faces, incidence cosines, path lengths
+    and footprint weights of every return are kept and the fields of all
+    wavenumbers are summed together, `block_size` phase terms at a time.
+    Unlike shoot_and_bounce no ray is dropped for low energy, since that
+    depends on the frequency.
+
+    Parameters:
+    bvh (BVH): Hierarchy over the target mesh.
+    direction (array): Unit vector from the target towards the radar.
+    wavenumbers (array): 2 * pi / wavelength for every frequency.
+    num_rays (int): Number of launched rays.
+    max_bounces (int): Maximum reflection depth.
+    reflectivity (callable): Optional f(faces, cosines) returning coefficients
+        of shape (len(wavenumbers), n), e.g. a materials.MaterialMap over the
+        same frequencies.
+    block_size (int): Phase terms evaluated per vectorized step.
+
+    Returns:
+    array: Radar cross section in square metres per wavenumber.
+    """
+    wavenumbers = np.asarray(wavenumbers, dtype=float)
+    origins, directions, tube_area, plane = launch_ray_grid(bvh, direction, num_rays)
+    lower, upper = bvh.bounds
+    offset = 1e-6 * np.linalg.norm(upper - lower)
+    field = np.zeros(len(wavenumbers), dtype=complex)
+    step = max(1, block_size // len(wavenumbers))
+    amplitude = previous = None
+    for bounce in trace_bounces(bvh, origins, directions, max_bounces, energy_threshold=0.0):
+        visible, weight, length = _radar_returns(bvh, bounce, direction, tube_area, plane, offset)
+        if reflectivity is not None:
+            # Amplitude of every live ray at every frequency, carried from the
+            # previous depth (whose ray indices are sorted) through this hit.
+            coefficients = reflectivity(bounce.faces, -np.einsum('ij,ij->i', bounce.incoming, bounce.normals))
+            if amplitude is not None:
+                coefficients = coefficients * amplitude[:, np.searchsorted(previous, bounce.rays)]
+            amplitude, previous = coefficients, bounce.rays
+            weight = amplitude[:, visible] * weight
+        for start in range(0, len(visible), step):
+            phase = np.exp(-1j * np.outer(wavenumbers, length[start:start + step]))
+            if reflectivity is None:
+                field += phase @ weight[start:start + step]
+            else:
+                field += np.einsum('ij,ij->i', phase, weight[:, start:start + step])
+    return wavenumbers ** 2 / np.pi * np.abs(field) ** 2
@@ -0,0 +1,623 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import numpy as np
+import profiling
+from cache import GeometryCache, default_cache
+from geometry import add_cell_data, polydata_from_mesh, shape_parts, write_polydata
+from mesh_import import DISPLAY_TRIANGLES, display_mesh, is_mesh_file
+from materials import MATERIALS, material_map, material_table
+from montecarlo import estimate_fraction, make_sampler
+from rays import sample_incoming_rays, reflect
+from rcs import angle_grid, rcs_sweep
+from sbr import trace_bounces
+from store import ResultStore
+from streaming import DEFAULT_MEMORY_LIMIT, RayStatistics, direction_histogram, stream_rays
+
+
+class Cancelled(Exception):
+    """Raised by a progress callback to abandon the stage in progress."""
+
+
+class ScatteringSimulation:
+    """
+    Headless radar scattering simulation.
+
+    Runs the shape, ray and scattering stages on NumPy arrays only; no window
+    and no VTK rendering objects are created. The interactive viewer in
+    index.py and the command line below are both consumers of `results()`.
+
+    Parameters:
+    shape (str): One of 'sphere', 'cube' or 'aircraft', or the path of an STL, OBJ or PLY file.
+    size (float): Scale of the shape.
+    frequency (float): Radar frequency in Hz.
+    num_points (int): Number of radar rays.
+    seed (int): Seed for the ray sampling, random if omitted.
+    max_bounces (int): Number of reflections followed for every ray.
+    resolution (int): Number of facets around curved surfaces.
+    cache (GeometryCache): Where meshes and their BVH come from, the shared on-disk cache if omitted.
+    proportions (dict): Aircraft proportions, see geometry.AIRCRAFT_PROPORTIONS.
+    materials (str or dict): Surface materials, one for the whole shape or by
+        part name (see geometry.shape_parts), as keys of materials.MATERIALS
+        or Material objects; every reflection is a perfect mirror if omitted.
+    progress (callable): Optional f(stage, done, total) called between chunks of
+        work; it may raise Cancelled to stop. A cancelled simulation is left
+        half-updated, so run cancellable work on a copy.copy() of it.
+    """
+
+    def __init__(self, shape='aircraft', size=1.0, frequency=1e10, num_points=1000, seed=None, max_bounces=1,
+                 resolution=50, cache=None, progress=None, materials=None, proportions=None):
+        self.shape = shape
+        self.size = size
+        self.frequency = frequency
+        self.num_points = num_points
+        self.wavelength = 3e8 / frequency
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.max_bounces = max_bounces
+        self.resolution = resolution
+        self.cache = default_cache if cache is None else cache
+        self.progress = progress
+        self.materials = materials
+        self.proportions = proportions
+        self.reflectivity = None
+        self.rcs_dbsm = None
+        self.sweep_rcs_dbsm = None
+        self.statistics = None
+        # Rays are drawn once at unit scale and rescaled when the geometry
+        # changes, so the batch can grow or shrink without being redrawn.
+        self.unit_origins = np.empty((0, 3))
+        self.unit_targets = np.empty((0, 3))
+
+    def report(self, stage, done, total):
+        if self.progress is not None:
+            self.progress(stage, done, total)
+
+    def intersect(self, stage, origins, directions, chunk_size=65536):
+        """Intersect rays with the shape in chunks, reporting progress between them."""
+        parts = []
+        for start in range(0, max(len(origins), 1), chunk_size):
+            self.report(stage, start, len(origins))
+            parts.append(self.bvh.intersect(origins[start:start + chunk_size], directions[start:start + chunk_size]))
+        self.report(stage, len(origins), len(origins))
+        return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+    def build_geometry(self):
+        self.report('build_geometry', 0, 1)
+        with profiling.stage('build_geometry'):
+            self.vertices, self.triangles, self.bvh, self.parts = self.cache.get(
+                self.shape, self.size, self.resolution, self.proportions)
+            self.update_reflectivity()
+            # Streamed totals and frequency sweeps belong to the mesh they were computed on.
+            self.statistics = None
+            self.sweep_rcs_dbsm = None
+            # Rays are traced against the full mesh; only what is drawn is decimated.
+            self.display_vertices, self.display_triangles = display_mesh(self.vertices, self.triangles,
+                                                                         DISPLAY_TRIANGLES)
+            self._shape_polydata = None
+
+    @property
+    def shape_polydata(self):
+        """Displayed surface as a vtkPolyData, wrapped on first use so that batch runs never load VTK."""
+        if self._shape_polydata is None:
+            self._shape_polydata = polydata_from_mesh(self.display_vertices, self.display_triangles)
+        return self._shape_polydata
+
+    def update_reflectivity(self):
+        """Resample the material tables of every part to the current frequency."""
+        if self.materials is None:
+            self.reflectivity = None
+        else:
+            self.reflectivity = material_map(self.shape, self.parts, self.materials, self.frequency)
+
+    def sample_rays(self):
+        """Draw or drop unit-scale rays so the batch holds num_points rays."""
+        missing = self.num_points - len(self.unit_origins)
+        if missing > 0:
+            profiling.count('rays_generated', missing)
+            origins, targets = sample_incoming_rays(missing, 1.0, self.rng)
+            self.unit_origins = np.concatenate([self.unit_origins, origins])
+            self.unit_targets = np.concatenate([self.unit_targets, targets])
+        else:
+            self.unit_origins = self.unit_origins[:self.num_points]
+            self.unit_targets = self.unit_targets[:self.num_points]
+
+    def launch_radius(self):
+        """Radius of the sphere rays start from, safely outside the shape."""
+        lower, upper = self.bvh.bounds
+        return 1.5 * max(self.size, np.linalg.norm(np.maximum(np.abs(lower), np.abs(upper))))
+
+    def trace_incoming_rays(self, first=0):
+        """Scale the ray batch to the current geometry and intersect rays from index `first` on."""
+        self.origins = self.unit_origins * self.launch_radius()
+        self.targets = self.unit_targets * self.size
+        self.directions = self.targets - self.origins
+        with profiling.stage('trace_incoming_rays'):
+            hits = self.intersect('trace_incoming_rays', self.origins[first:], self.directions[first:])
+        profiling.count('rays_hit', np.count_nonzero(hits[1] >= 0))
+        if first == 0:
+            self.hit_t, self.hit_faces, self.hit_points, self.hit_normals = hits
+        else:
+            previous = (self.hit_t, self.hit_faces, self.hit_points, self.hit_normals)
+            self.hit_t, self.hit_faces, self.hit_points, self.hit_normals = (
+                np.concatenate([old[:first], new]) for old, new in zip(previous, hits))
+
+    def truncate_rays(self):
+        """Drop traced rays and their reflections beyond num_points."""
+        count = self.num_points
+        self.origins, self.targets, self.directions = self.origins[:count], self.targets[:count], self.directions[:count]
+        self.hit_t, self.hit_faces = self.hit_t[:count], self.hit_faces[:count]
+        self.hit_points, self.hit_normals = self.hit_points[:count], self.hit_normals[:count]
+        kept = self.scattered_owners < count
+        self.scattered_starts = self.scattered_starts[kept]
+        self.scattered_ends = self.scattered_ends[kept]
+        self.scattered_owners = self.scattered_owners[kept]
+        self.update_first_reflections()
+
+    def update_first_reflections(self):
+        hit = self.hit_faces >= 0
+        incoming = self.directions[hit] / np.linalg.norm(self.directions[hit], axis=1, keepdims=True)
+        self.scattered_origins = self.hit_points[hit]
+        self.scattered_directions = reflect(incoming, self.hit_normals[hit])
+
+    def compute_scattered_rays(self, first=0):
+        """Reflection segments of the rays from index `first` on, appended to those of earlier rays."""
+        with profiling.stage('compute_scattered_rays'):
+            self._compute_scattered_rays(first)
+
+    def _compute_scattered_rays(self, first):
+        self.update_first_reflections()
+        owners = np.flatnonzero(self.hit_faces[first:] >= 0) + first
+        incoming = self.directions[owners] / np.linalg.norm(self.directions[owners], axis=1, keepdims=True)
+        normals = self.hit_normals[owners]
+        origins = self.hit_points[owners]
+        directions = reflect(incoming, normals)
+
+        # One segment per reflection: it ends at the next hit, or after
+        # `size` if the ray leaves the shape.
+        starts = [origins]
+        ends = [origins + self.size * directions]
+        segment_owners = [owners]
+        previous_rays = np.arange(len(owners))
+        if self.max_bounces > 1:
+            facing = normals * np.where(np.einsum('ij,ij->i', incoming, normals) > 0, -1.0, 1.0)[:, None]
+            lower, upper = self.bvh.bounds
+            launch = origins + 1e-6 * np.linalg.norm(upper - lower) * facing
+            for depth, bounce in enumerate(trace_bounces(self.bvh, launch, directions, self.max_bounces - 1)):
+                self.report('compute_scattered_rays', depth + 1, self.max_bounces)
+                ends[-1][np.searchsorted(previous_rays, bounce.rays)] = bounce.points
+                starts.append(bounce.points)
+                ends.append(bounce.points + self.size * bounce.outgoing)
+                segment_owners.append(owners[bounce.rays])
+                previous_rays = bounce.rays
+        if first > 0:
+            kept = self.scattered_owners < first
+            starts.insert(0, self.scattered_starts[kept])
+            ends.insert(0, self.scattered_ends[kept])
+            segment_owners.insert(0, self.scattered_owners[kept])
+        self.scattered_starts = np.concatenate(starts)
+        self.scattered_ends = np.concatenate(ends)
+        self.scattered_owners = np.concatenate(segment_owners)
+
+    def scattered_direction_histogram(self, bins=(72, 36)):
+        """
+        Where reflected rays head, binned by (azimuth, elevation).
+
+        Uses the power leaving the shape from the last streamed statistics if
+        there are any, otherwise counts the reflections of the traced batch.
+        Streamed statistics are binned once, so `bins` must then match the
+        `direction_bins` they were streamed with.
+        """
+        if self.statistics is not None:
+            if self.statistics.direction_energy.shape != tuple(bins)[::-1]:
+                raise ValueError(f"Streamed statistics are binned {self.statistics.direction_energy.shape[::-1]}, "
+                                 f"not {tuple(bins)}; stream again with direction_bins={tuple(bins)}")
+            return self.statistics.direction_energy
+        directions = self.scattered_ends - self.scattered_starts
+        directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+        return direction_histogram(directions, bins=bins)
+
+    def compute_phases(self):
+        """Phase of every incoming ray at its hit point for the current wavelength."""
+        distance = self.hit_t * np.linalg.norm(self.directions, axis=1)
+        self.phases = np.where(self.hit_faces >= 0, 2 * np.pi / self.wavelength * distance, np.nan)
+
+    def ground_hit_percentage(self, tolerance=None, confidence=0.95, max_samples=None, sampling='random',
+                              chunk_size=65536, seed=None):
+        """
+        Percentage of radar rays reflected by the shape towards the ground.
+
+        Fresh rays are drawn in vectorized chunks from a seeded generator and
+        intersected with the shape; a ray counts as a ground hit when its
+        reflection off the true surface normal points downwards (z < 0). With
+        materials, each ground hit only counts with its reflected power |r|^2.
+
+        Parameters:
+        tolerance (float): Stop once the confidence half-width is at most this
+            many percentage points; run to max_samples if None.
+        confidence (float): Confidence level of the reported interval.
+        max_samples (int): Sample budget, num_points if omitted.
+        sampling (str): 'random', 'stratified' or 'sobol' direction sampling.
+        chunk_size (int): Rays traced per vectorized chunk.
+        seed (int): Seed of the estimator, the simulation seed if omitted.
+
+        Returns:
+        tuple: Percentage, (low, high) interval in percent and samples used.
+        """
+        rng = np.random.default_rng(self.seed if seed is None else seed)
+        sampler = make_sampler(sampling, rng)
+        radius = self.launch_radius()
+
+        max_samples = max_samples or self.num_points
+
+        def ground_hits(count, start):
+            self.report('ground_hit_percentage', start, max_samples)
+            profiling.count('rays_generated', count)
+            origins, targets = sample_incoming_rays(count, self.size, rng, radius, sampler(count, start))
+            directions = targets - origins
+            _, faces, _, normals = self.bvh.intersect(origins, directions)
+            hit = faces >= 0
+            profiling.count('rays_hit', np.count_nonzero(hit))
+            ground = np.zeros(count, dtype=bool)
+            ground[hit] = reflect(directions[hit], normals[hit])[:, 2] < 0
+            if self.reflectivity is None:
+                return ground
+            cosines = np.abs(np.einsum('ij,ij->i', directions[ground], normals[ground]))
+            cosines /= np.linalg.norm(directions[ground], axis=1)
+            power = np.zeros(count)
+            power[ground] = np.abs(self.reflectivity(faces[ground], cosines)) ** 2
+            return power
+
+        with profiling.stage('ground_hit_percentage'):
+            fraction, (low, high), samples = estimate_fraction(
+                ground_hits, max_samples,
+                None if tolerance is None else tolerance / 100, confidence, chunk_size)
+        return 100 * fraction, (100 * low, 100 * high), samples
+
+    def stream_statistics(self, num_rays, memory_limit=DEFAULT_MEMORY_LIMIT, chunk_size=None, sampling='random',
+                          seed=None, progress=None, direction_bins=(72, 36)):
+        """
+        Hit counts, per-face power and departure directions of a large ray stream.
+
+        Rays are drawn, traced for up to `max_bounces` reflections and reduced
+        chunk by chunk, so `num_rays` is not limited by memory. The result is
+        kept for `results()`.
+
+        Parameters:
+        num_rays (int): Number of rays.
+        memory_limit (int): Approximate working-memory ceiling in bytes.
+        chunk_size (int): Rays per chunk, derived from memory_limit if omitted.
+        sampling (str): 'random', 'stratified' or 'sobol' direction sampling.
+        seed (int): Seed of the stream, the simulation seed if omitted.
+        progress (callable): Optional f(statistics) called after every chunk.
+        direction_bins (tuple): (azimuth, elevation) bins of the departure histogram.
+
+        Returns:
+        RayStatistics: Reductions over all rays, empty if num_rays is 0.
+        """
+        rng = np.random.default_rng(self.seed if seed is None else seed)
+        statistics = RayStatistics(self.bvh.num_triangles, direction_bins)
+        with profiling.stage('stream_rays'):
+            for statistics in stream_rays(self.bvh, num_rays, self.size, self.launch_radius(), rng,
+                                          make_sampler(sampling, rng), chunk_size, memory_limit, self.max_bounces,
+                                          reflectivity=self.reflectivity, direction_bins=direction_bins):
+                if progress is not None:
+                    progress(statistics)
+        profiling.count('rays_generated', statistics.rays)
+        profiling.count('rays_hit', statistics.hits)
+        self.statistics = statistics
+        return statistics
+
+    def frequency_sweep(self, frequencies, azimuths, elevations, workers=None, method='sbr', num_rays=250000):
+        """
+        Monostatic RCS in dBsm at many frequencies over an azimuth x elevation grid.
+
+        Every look angle is traced and intersected once; the path lengths,
+        footprint weights and hit faces are reused for all frequencies, whose
+        phases and material coefficients are evaluated as one vectorized
+        reduction. The sweep is kept for `results()`.
+
+        Returns:
+        array: RCS of shape (len(frequencies), len(elevations), len(azimuths)).
+        """
+        self.sweep_frequencies = np.asarray(frequencies, dtype=float)
+        self.sweep_azimuths = np.asarray(azimuths, dtype=float)
+        self.sweep_elevations = np.asarray(elevations, dtype=float)
+        options = {'num_rays': num_rays, 'max_bounces': self.max_bounces} if method == 'sbr' else {}
+        if self.materials is not None:
+            options['reflectivity'] = material_map(self.shape, self.parts, self.materials, self.sweep_frequencies)
+        with profiling.stage('frequency_sweep'):
+            self.sweep_rcs_dbsm = rcs_sweep(self.bvh, self.sweep_frequencies, self.sweep_azimuths,
+                                            self.sweep_elevations, workers, method, **options)
+        return self.sweep_rcs_dbsm
+
+    def face_map(self):
+        """
+        The full-resolution mesh with the per-face totals of the last ray stream as cell data.
+
+        Arrays are the hit count, incident, reflected and backscattered power
+        of every triangle and its area; backscatter is the active scalar.
+        """
+        if self.statistics is None:
+            raise ValueError("No streamed statistics; call stream_statistics first")
+        arrays = dict(self.statistics.faces.results(), face_area=self.bvh.face_areas)
+        return add_cell_data(polydata_from_mesh(self.vertices, self.triangles), arrays, 'face_backscatter')
+
+    def save_face_map(self, path):
+        write_polydata(path, self.face_map())
+
+    def rcs_pattern(self, azimuths, elevations, workers=None, method='po', num_rays=250000):
+        """
+        Monostatic RCS in dBsm over an azimuth x elevation grid given in degrees.
+
+        With method='sbr' the rays are followed for up to `max_bounces` reflections.
+        The settings are kept so that `update` can refresh the pattern.
+        """
+        self.azimuths = np.asarray(azimuths, dtype=float)
+        self.elevations = np.asarray(elevations, dtype=float)
+        self.rcs_settings = (workers, method, num_rays)
+        options = {'num_rays': num_rays, 'max_bounces': self.max_bounces} if method == 'sbr' else {}
+        if self.reflectivity is not None:
+            options['reflectivity'] = self.reflectivity
+        with profiling.stage('rcs_sweep'):
+            self.rcs_dbsm = rcs_sweep(self.bvh, self.frequency, self.azimuths, self.elevations, workers, method, **options)
+        return self.rcs_dbsm
+
+    def run(self):
+        self.build_geometry()
+        self.sample_rays()
+        self.trace_incoming_rays()
+        self.compute_scattered_rays()
+        self.compute_phases()
+        return self.results()
+
+    def update(self, shape=None, size=None, frequency=None, num_points=None, materials=None):
+        """
+        Apply parameter changes and recompute only the stages that depend on them.
+
+        Shape and size rebuild the geometry and re-intersect the existing rays,
+        num_points extends or truncates the traced batch, and frequency only
+        refreshes the phases, the material coefficients and the RCS pattern.
+        New materials refresh the coefficients and the RCS pattern. Streamed
+        statistics and frequency sweeps that no longer apply are dropped.
+
+        Returns:
+        set: Names of the recomputed stages among 'geometry', 'rays',
+        'scattering', 'phase', 'materials' and 'rcs'.
+        """
+        geometry_changed = (shape is not None and shape != self.shape) or (size is not None and size != self.size)
+        count_changed = num_points is not None and num_points != self.num_points
+        frequency_changed = frequency is not None and frequency != self.frequency
+        materials_changed = materials is not None and materials != self.materials
+        if shape is not None:
+            self.shape = shape
+        if size is not None:
+            self.size = size
+        if frequency is not None:
+            self.frequency = frequency
+            self.wavelength = 3e8 / frequency
+        if num_points is not None:
+            self.num_points = num_points
+        if materials_changed:
+            self.materials = materials
+
+        stages = set()
+        if geometry_changed:
+            self.build_geometry()
+            self.sample_rays()
+            self.trace_incoming_rays()
+            self.compute_scattered_rays()
+            stages |= {'geometry', 'rays', 'scattering', 'phase', 'rcs'}
+        elif count_changed:
+            first = len(self.unit_origins)
+            self.sample_rays()
+            if self.num_points > first:
+                self.trace_incoming_rays(first)
+                self.compute_scattered_rays(first)
+            else:
+                self.truncate_rays()
+            stages |= {'rays', 'scattering', 'phase'}
+        if frequency_changed:
+            stages |= {'phase', 'rcs'}
+        if materials_changed and not geometry_changed:
+            # The sweep has its own frequencies, but not its own materials.
+            self.sweep_rcs_dbsm = None
+            stages.add('rcs')
+        if (frequency_changed or materials_changed) and self.materials is not None and not geometry_changed:
+            self.update_reflectivity()
+            # Streamed power was reflected by the old coefficients.
+            self.statistics = None
+            stages.add('materials')
+        if 'phase' in stages:
+            self.compute_phases()
+        if 'rcs' in stages and self.rcs_dbsm is not None:
+            self.rcs_pattern(self.azimuths, self.elevations, *self.rcs_settings)
+        else:
+            stages.discard('rcs')
+        return stages
+
+    def results(self):
+        results = {
+            'shape': np.array(self.shape),
+            'size': np.array(self.size),
+            'frequency': np.array(self.frequency),
+            'wavelength': np.array(self.wavelength),
+            'num_points': np.array(self.num_points),
+            'vertices': self.vertices,
+            'triangles': self.triangles,
+            'face_parts': self.parts,
+            'origins': self.origins,
+            'targets': self.targets,
+            'hit_t': self.hit_t,
+            'hit_faces': self.hit_faces,
+            'hit_points': self.hit_points,
+            'hit_normals': self.hit_normals,
+            'scattered_origins': self.scattered_origins,
+            'scattered_directions': self.scattered_directions,
+            'scattered_starts': self.scattered_starts,
+            'scattered_ends': self.scattered_ends,
+            'phases': self.phases,
+        }
+        if self.rcs_dbsm is not None:
+            results.update(azimuths=self.azimuths, elevations=self.elevations, rcs_dbsm=self.rcs_dbsm)
+        if self.sweep_rcs_dbsm is not None:
+            results.update(sweep_frequencies=self.sweep_frequencies, sweep_azimuths=self.sweep_azimuths,
+                           sweep_elevations=self.sweep_elevations, sweep_rcs_dbsm=self.sweep_rcs_dbsm)
+        if self.statistics is not None:
+            results.update(self.statistics.results())
+        return results
+
+
+def save_results(path, results):
+    """
+    Write simulation results to a compressed .npz archive.
+
+    Parameters:
+    path (str): Output file.
+    results (dict): Arrays returned by ScatteringSimulation.results().
+    """
+    np.savez_compressed(path, **results)
+
+
+def shape_argument(value):
+    if value in ('sphere', 'cube', 'aircraft'):
+        return value
+    if is_mesh_file(value) and os.path.isfile(value):
+        return value
+    raise argparse.ArgumentTypeError(f"expected sphere, cube, aircraft or an .stl/.obj/.ply file, got {value!r}")
+
+
+def run_settings(args, shape, size, frequency, num_points):
+    """Every command-line setting that one run's stored results depend on."""
+    settings = {'shape': shape, 'size': size, 'frequency': frequency, 'num_points': num_points}
+    if is_mesh_file(shape):
+        stat = os.stat(shape)
+        settings.update(shape=os.path.abspath(shape), mtime=stat.st_mtime_ns, bytes=stat.st_size)
+    for name in ('seed', 'max_bounces', 'resolution', 'material', 'azimuth', 'elevation', 'sweep', 'method',
+                 'sbr_rays', 'stream_rays', 'memory_limit'):
+        settings[name] = getattr(args, name)
+    if not args.azimuth:
+        # The elevation grid, RCS method and SBR rays are unused without one.
+        settings.update(elevation=None, method=None, sbr_rays=None)
+    if not args.stream_rays:
+        settings['memory_limit'] = None
+    return settings
+
+
+def run_key(stem, settings):
+    """Readable store key of a run, made unique by a hash of all its settings."""
+    payload = json.dumps(settings, sort_keys=True)
+    return f"{stem}_{hashlib.sha256(payload.encode()).hexdigest()[:16]}"
+
+
+def materials_argument(values):
+    """Turn ['ram'] into 'ram' and ['fuselage=ram', 'wings=glass'] into a dict by part."""
+    if values is None:
+        return None
+    if len(values) == 1 and '=' not in values[0]:
+        return values[0]
+    return dict(value.split('=', 1) for value in values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless radar scattering simulation. "
+                                                 "Every combination of the given values is run.")
+    parser.add_argument('--shape', nargs='+', default=['aircraft'], type=shape_argument,
+                        help='Shapes to simulate: sphere, cube, aircraft or mesh files (.stl, .obj, .ply).')
+    parser.add_argument('--size', nargs='+', type=float, default=[1.0], help='Shape sizes.')
+    parser.add_argument('--frequency', nargs='+', type=float, default=[1e10], help='Radar frequencies in Hz.')
+    parser.add_argument('--num_points', nargs='+', type=int, default=[1000], help='Numbers of radar rays.')
+    parser.add_argument('--resolution', type=int, default=50, help='Facets around curved surfaces.')
+    parser.add_argument('--cache_dir', default=None, help='Geometry cache directory, ~/.cache/haveblue or $HAVEBLUE_CACHE_DIR by default.')
+    parser.add_argument('--no_cache', action='store_true', help='Keep built geometry in memory only.')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for the ray sampling.')
+    parser.add_argument('--azimuth', nargs=3, type=float, metavar=('START', 'STOP', 'STEP'), help='Azimuth grid in degrees for an RCS sweep.')
+    parser.add_argument('--elevation', nargs=3, type=float, default=[0, 0, 1], metavar=('START', 'STOP', 'STEP'), help='Elevation grid in degrees for an RCS sweep.')
+    parser.add_argument('--sweep', nargs=3, type=float, metavar=('START', 'STOP', 'COUNT'),
+                        help='Frequencies in Hz for an RCS sweep over the --azimuth/--elevation grid, traced once per look angle.')
+    parser.add_argument('--method', default='po', choices=['po', 'sbr'], help='RCS estimate: facet physical optics or shooting and bouncing rays.')
+    parser.add_argument('--material', nargs='+', default=None, metavar='[PART=]NAME',
+                        help=f"Surface material for the whole shape or per part; one of {', '.join(MATERIALS)}. "
+                             "Perfect mirrors if omitted.")
+    parser.add_argument('--max_bounces', type=int, default=1, help='Reflections followed per ray (rays drawn and SBR).')
+    parser.add_argument('--sbr_rays', type=int, default=250000, help='Rays launched per look angle in SBR mode.')
+    parser.add_argument('--stream_rays', type=int, default=0, help='Rays reduced chunk by chunk into hit and per-face statistics.')
+    parser.add_argument('--face_map', action='store_true', help='With --stream_rays, also write the per-face hit and power map as a .vtp mesh.')
+    parser.add_argument('--memory_limit', type=float, default=DEFAULT_MEMORY_LIMIT / 2 ** 20, help='Working-memory ceiling of the ray stream in MiB.')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes for the RCS sweep, all cores by default.')
+    parser.add_argument('--profile', nargs='?', const='profile.json', default=None, metavar='JSON',
+                        help='Time every stage, count rays and triangle tests, and write a JSON report (profile.json by default).')
+    parser.add_argument('--profile_memory', action='store_true', help='Also record per-stage allocation peaks when profiling.')
+    parser.add_argument('--output_dir', default='results', help='Directory the .npz result files and face maps are written to.')
+    parser.add_argument('--store', default=None, metavar='DIR',
+                        help='Append results to a memory-mappable columnar store instead of .npz files; '
+                             'runs already in the store are skipped, so an interrupted sweep resumes.')
+    args = parser.parse_args()
+    if args.sweep and not args.azimuth:
+        parser.error('--sweep needs an --azimuth grid')
+    materials = materials_argument(args.material)
+    if materials is not None:
+        for name in (materials.values() if isinstance(materials, dict) else [materials]):
+            if name not in MATERIALS:
+                parser.error(f"unknown material {name!r}; one of {', '.join(MATERIALS)}")
+        for shape in args.shape:
+            try:
+                material_table(shape_parts(shape), materials)
+            except ValueError as error:
+                parser.error(f"--material for {shape}: {error}")
+    if args.profile:
+        profiling.enable(args.profile_memory, args.profile)
+
+    if args.no_cache:
+        cache = GeometryCache(directory=None)
+    elif args.cache_dir:
+        cache = GeometryCache(directory=args.cache_dir)
+    else:
+        cache = default_cache
+    store = ResultStore(args.store) if args.store else None
+    # With a store only the face maps go to files.
+    if store is None or (args.stream_rays and args.face_map):
+        os.makedirs(args.output_dir, exist_ok=True)
+    for shape, size, frequency, num_points in itertools.product(args.shape, args.size, args.frequency, args.num_points):
+        name = os.path.splitext(os.path.basename(shape))[0]
+        stem = f"{name}_size{size:g}_freq{frequency:g}_n{num_points}"
+        settings = run_settings(args, shape, size, frequency, num_points)
+        key = run_key(stem, settings)
+        if store is not None and key in store:
+            print(f"{key}: already in {args.store}")
+            continue
+        simulation = ScatteringSimulation(shape, size, frequency, num_points, args.seed, args.max_bounces,
+                                          args.resolution, cache, materials=materials)
+        simulation.run()
+        if args.azimuth:
+            rcs = simulation.rcs_pattern(angle_grid(*args.azimuth), angle_grid(*args.elevation), args.workers,
+                                         args.method, args.sbr_rays)
+            print(f"{shape} size {size:g} at {frequency:g} Hz: RCS {rcs.min():.1f} to {rcs.max():.1f} dBsm")
+        if args.sweep:
+            start, stop, count = args.sweep
+            sweep = simulation.frequency_sweep(np.linspace(start, stop, int(count)), angle_grid(*args.azimuth),
+                                               angle_grid(*args.elevation), args.workers, args.method, args.sbr_rays)
+            print(f"{shape} size {size:g} from {start:g} to {stop:g} Hz: RCS {sweep.min():.1f} to {sweep.max():.1f} dBsm")
+        if args.stream_rays:
+            statistics = simulation.stream_statistics(args.stream_rays, int(args.memory_limit * 2 ** 20))
+            print(f"{shape} size {size:g}: {statistics.hit_percentage:.3f}% of {statistics.rays} streamed rays hit, "
+                  f"{statistics.ground_hit_percentage:.3f}% towards the ground")
+        results = simulation.results()
+        stem = os.path.join(args.output_dir, stem)
+        if args.stream_rays and args.face_map:
+            simulation.save_face_map(f"{stem}_faces.vtp")
+            print(f"{stem}_faces.vtp: per-face map")
+        if store is not None:
+            store.append(key, results, settings)
+            path = f"{args.store} [{key}]"
+        else:
+            path = f"{stem}.npz"
+            save_results(path, results)
+        hits = np.count_nonzero(results['hit_faces'] >= 0)
+        print(f"{path}: {hits}/{num_points} rays hit the shape")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import argparse
+import json
+import os
+import numpy as np
+
+INDEX_FILE = 'index.jsonl'
+
+# Values are written in slices of this many elements, so converting a large
+# array to its stored type never needs a full-size temporary.
+WRITE_CHUNK = 1 << 20
+
+
+def stored_dtype(array):
+    """float32 for real, complex64 for complex, int32 (int64 if needed) for integer and bool arrays."""
+    if np.issubdtype(array.dtype, np.complexfloating):
+        return np.dtype('<c8')
+    if np.issubdtype(array.dtype, np.floating):
+        return np.dtype('<f4')
+    if array.dtype == bool:
+        return np.dtype('<i4')
+    if np.issubdtype(array.dtype, np.integer):
+        limits = np.iinfo(np.int32)
+        fits = array.size == 0 or (limits.min <= array.min() and array.max() <= limits.max)
+        return np.dtype('<i4' if fits else '<i8')
+    raise TypeError(f"Cannot store arrays of type {array.dtype}")
+
+
+def _json_value(value):
+    value = value.item() if isinstance(value, np.ndarray) else value
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class ResultStore:
+    """
+    Append-only columnar store of simulation records, read back by memory mapping.
+
+    Every array name is a column: one flat binary file that the arrays of
+    successive records are appended to, as float32, complex64 or integers. An
+    index line per record, written only once its arrays are flushed, holds
+    the record's key, metadata and where its arrays sit in each column. A
+    record cut short by an interruption is therefore never indexed, and its
+    partial bytes are cut off the next time the store is opened for writing.
+
+    Parameters:
+    directory (str): Location of the store, created if missing.
+    mode (str): 'a' to read and append, 'r' to read only.
+    """
+
+    def __init__(self, directory, mode='a'):
+        self.directory = directory
+        self.mode = mode
+        self.records = {}
+        index = os.path.join(directory, INDEX_FILE)
+        if mode == 'a':
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(index):
+            with open(index) as handle:
+                for line in handle:
+                    # A torn last line is an unfinished record.
+                    if line.endswith('\n'):
+                        record = json.loads(line)
+                        self.records[record['key']] = record
+        if mode == 'a':
+            self._truncate()
+
+    def __contains__(self, key):
+        return key in self.records
+
+    def __len__(self):
+        return len(self.records)
+
+    def keys(self):
+        return list(self.records)
+
+    def column_path(self, name):
+        return os.path.join(self.directory, f'{name}.bin')
+
+    def _truncate(self):
+        """Cut every column and the index back to the last complete record."""
+        ends = {}
+        for record in self.records.values():
+            for name, (offset, shape, dtype) in record['columns'].items():
+                end = offset + int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+                ends[name] = max(ends.get(name, 0), end)
+        for entry in os.listdir(self.directory):
+            if entry.endswith('.bin'):
+                path = os.path.join(self.directory, entry)
+                if os.path.getsize(path) > ends.get(entry[:-4], 0):
+                    os.truncate(path, ends.get(entry[:-4], 0))
+        index = os.path.join(self.directory, INDEX_FILE)
+        if os.path.exists(index):
+            with open(index, 'rb') as handle:
+                content = handle.read()
+            if content and not content.endswith(b'\n'):
+                with open(index, 'wb') as handle:
+                    handle.write(content[:content.rfind(b'\n') + 1])
+
+    def append(self, key, arrays, metadata=None):
+        """
+        Add one record.
+
+        Parameters:
+        key (str): Unique record name, e.g. the run's parameters.
+        arrays (dict): Arrays by column name; 0-d arrays go to the metadata.
+        metadata (dict): JSON-serializable run metadata.
+        """
+        if self.mode != 'a':
+            raise ValueError("Store is read-only")
+        if key in self.records:
+            raise KeyError(f"Record {key!r} is already stored")
+        metadata = dict(metadata or {})
+        columns = {}
+        for name, array in arrays.items():
+            array = np.asarray(array)
+            if array.ndim == 0:
+                metadata[name] = _json_value(array)
+                continue
+            dtype = stored_dtype(array)
+            flat = array.reshape(-1)
+            with open(self.column_path(name), 'ab') as handle:
+                offset = handle.tell()
+                for start in range(0, len(flat), WRITE_CHUNK):
+                    handle.write(flat[start:start + WRITE_CHUNK].astype(dtype).tobytes())
+                handle.flush()
+                os.fsync(handle.fileno())
+            columns[name] = [offset, list(array.shape), dtype.str]
+        record = {'key': key, 'metadata': metadata, 'columns': columns}
+        with open(os.path.join(self.directory, INDEX_FILE), 'a') as handle:
+            handle.write(json.dumps(record) + '\n')
+        self.records[key] = record
+
+    def metadata(self, key):
+        return self.records[key]['metadata']
+
+    def read(self, key, names=None):
+        """
+        Arrays of one record as read-only memory maps; nothing is loaded until used.
+
+        Parameters:
+        key (str): Record name.
+        names (list): Columns to map, all of the record's if omitted.
+
+        Returns:
+        dict: Arrays by column name.
+        """
+        columns = self.records[key]['columns']
+        arrays = {}
+        for name in columns if names is None else names:
+            offset, shape, dtype = columns[name]
+            if int(np.prod(shape)) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(self.column_path(name), dtype=dtype, mode='r', offset=offset,
+                                         shape=tuple(shape))
+        return arrays
+
+    def column(self, name):
+        """
+        One column across every record that has it, as (keys, arrays) with lazily mapped arrays.
+        """
+        keys = [key for key, record in self.records.items() if name in record['columns']]
+        return keys, [self.read(key, [name])[name] for key in keys]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List the records of a result store without loading their arrays.")
+    parser.add_argument('directory', help='Result store directory.')
+    parser.add_argument('--key', default=None, help='Show the metadata and columns of one record.')
+    args = parser.parse_args()
+    store = ResultStore(args.directory, mode='r')
+    for key in [args.key] if args.key else store.keys():
+        record = store.records[key]
+        print(key)
+        if args.key:
+            for name, value in record['metadata'].items():
+                print(f"  {name} = {value}")
+        for name, (_, shape, dtype) in record['columns'].items():
+            print(f"  {name:24s} {np.dtype(dtype).name:10s} {tuple(shape)}")
+
+
+if __name__ == "__main__":
+    main()
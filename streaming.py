@@ -0,0 +1,257 @@
+import numpy as np
+from rays import sample_incoming_rays
+from sbr import Bounce, trace_bounces
+
+# Generous bound on the transient memory one ray needs while it is drawn,
+# intersected and reduced (ray arrays, BVH traversal pairs, bounce arrays);
+# measured peaks stay below 400 bytes per ray for chunks of 2^18 rays.
+BYTES_PER_RAY = 1024
+
+DEFAULT_MEMORY_LIMIT = 1 << 30
+
+# Half-angle in degrees of the cone around the way back to the radar that
+# counts as backscatter.
+BACKSCATTER_ANGLE = 10.0
+
+
+def chunk_size_for(memory_limit, bytes_per_ray=BYTES_PER_RAY):
+    """Number of rays per chunk that keeps the pipeline under `memory_limit` bytes."""
+    return max(1024, int(memory_limit // bytes_per_ray))
+
+
+def direction_histogram(directions, weights=None, bins=(72, 36)):
+    """
+    Bin directions by azimuth and elevation.
+
+    Parameters:
+    directions (array): Unit vectors of shape (n, 3).
+    weights (array): Optional weight per direction, counts if omitted.
+    bins (tuple): Number of (azimuth, elevation) bins.
+
+    Returns:
+    array: Summed weights of shape (elevation bins, azimuth bins), rows from
+    straight down to straight up, columns from azimuth -pi to pi.
+    """
+    columns, rows = bins
+    azimuth = np.arctan2(directions[:, 1], directions[:, 0])
+    elevation = np.arcsin(np.clip(directions[:, 2], -1.0, 1.0))
+    column = np.minimum(((azimuth + np.pi) / (2 * np.pi) * columns).astype(np.intp), columns - 1)
+    row = np.minimum(((elevation + np.pi / 2) / np.pi * rows).astype(np.intp), rows - 1)
+    return np.bincount(row * columns + column, weights, minlength=rows * columns).reshape(rows, columns)
+
+
+class FaceAccumulator:
+    """
+    Per-triangle totals of a ray stream, showing which surfaces to treat.
+
+    Every update is one np.bincount scatter-add over a whole batch, and
+    accumulators over the same mesh can be merged, e.g. across workers.
+
+    Parameters:
+    num_faces (int): Number of mesh faces.
+    backscatter_angle (float): Half-angle in degrees of the cone around the
+        direction back to a ray's radar inside which departing power counts
+        as backscatter.
+
+    Attributes:
+    hits (array): Reflections on every face, shape (num_faces,).
+    incident_power (array): Power arriving on every face.
+    energy (array): Power reflected by every face.
+    backscatter (array): Power leaving the shape towards the radar after its
+        last reflection on every face.
+    """
+
+    def __init__(self, num_faces, backscatter_angle=BACKSCATTER_ANGLE):
+        self.backscatter_cosine = np.cos(np.radians(backscatter_angle))
+        self.hits = np.zeros(num_faces, dtype=np.int64)
+        self.incident_power = np.zeros(num_faces)
+        self.energy = np.zeros(num_faces)
+        self.backscatter = np.zeros(num_faces)
+
+    def add_bounce(self, bounce):
+        num_faces = len(self.hits)
+        self.hits += np.bincount(bounce.faces, minlength=num_faces)
+        self.incident_power += np.bincount(bounce.faces, np.abs(bounce.arriving) ** 2, minlength=num_faces)
+        self.energy += np.bincount(bounce.faces, np.abs(bounce.amplitude) ** 2, minlength=num_faces)
+
+    def add_departures(self, faces, outgoing, energy, radar_directions):
+        """Credit the faces whose reflection leaves the shape towards the radar (unit `radar_directions`)."""
+        back = np.einsum('ij,ij->i', outgoing, radar_directions) >= self.backscatter_cosine
+        self.backscatter += np.bincount(faces[back], energy[back], minlength=len(self.backscatter))
+
+    def merge(self, other):
+        self.hits += other.hits
+        self.incident_power += other.incident_power
+        self.energy += other.energy
+        self.backscatter += other.backscatter
+        return self
+
+    def results(self):
+        return {
+            'face_hits': self.hits,
+            'face_incident_power': self.incident_power,
+            'face_energy': self.energy,
+            'face_backscatter': self.backscatter,
+        }
+
+
+class RayStatistics:
+    """
+    Reductions of a ray stream that stay the same size whatever the ray count.
+
+    Parameters:
+    num_faces (int): Number of mesh faces.
+    direction_bins (tuple): Number of (azimuth, elevation) bins for the
+        directions rays leave the shape in.
+    backscatter_angle (float): Backscatter cone half-angle in degrees, see FaceAccumulator.
+
+    Attributes:
+    rays (int): Rays launched.
+    hits (int): Rays that hit the shape.
+    ground_hits (float): Rays that leave the shape heading down (z < 0),
+        each counted with its remaining power |amplitude|^2, so a plain count
+        for perfect mirrors.
+    dropped (int): Rays whose power fell below the energy threshold before
+        they left the shape; they are not counted as departures.
+    faces (FaceAccumulator): Per-face hits, incident, reflected and backscattered power.
+    direction_energy (array): Power leaving the shape per direction bin,
+        shape (elevation bins, azimuth bins).
+    """
+
+    def __init__(self, num_faces, direction_bins=(72, 36), backscatter_angle=BACKSCATTER_ANGLE):
+        self.rays = 0
+        self.hits = 0
+        self.ground_hits = 0.0
+        self.dropped = 0
+        self.faces = FaceAccumulator(num_faces, backscatter_angle)
+        self.direction_energy = np.zeros(direction_bins[::-1])
+
+    @property
+    def hit_percentage(self):
+        return 100 * self.hits / self.rays if self.rays else 0.0
+
+    @property
+    def ground_hit_percentage(self):
+        return 100 * self.ground_hits / self.rays if self.rays else 0.0
+
+    def add_bounce(self, bounce):
+        self.faces.add_bounce(bounce)
+
+    def add_departures(self, bounce, radar_directions):
+        """
+        Count rays leaving the shape after their last traced reflection.
+
+        Parameters:
+        bounce (Bounce): The reflections the rays leave from.
+        radar_directions (array): Unit direction back to the radar of every
+            ray in the launched batch.
+        """
+        energy = np.abs(bounce.amplitude) ** 2
+        self.direction_energy += direction_histogram(bounce.outgoing, energy, self.direction_energy.shape[::-1])
+        self.ground_hits += float(np.sum(energy[bounce.outgoing[:, 2] < 0]))
+        self.faces.add_departures(bounce.faces, bounce.outgoing, energy, radar_directions[bounce.rays])
+
+    def merge(self, other):
+        """Add the reductions of another stream over the same mesh."""
+        self.rays += other.rays
+        self.hits += other.hits
+        self.ground_hits += other.ground_hits
+        self.dropped += other.dropped
+        self.faces.merge(other.faces)
+        self.direction_energy += other.direction_energy
+        return self
+
+    def results(self):
+        return dict(self.faces.results(),
+                    stream_rays=np.array(self.rays),
+                    stream_hits=np.array(self.hits),
+                    stream_ground_hits=np.array(self.ground_hits),
+                    stream_dropped=np.array(self.dropped),
+                    direction_energy=self.direction_energy)
+
+
+def ray_chunks(num_rays, chunk_size, size, radius, rng, sampler=None):
+    """
+    Draw incoming radar rays lazily, one chunk at a time.
+
+    Parameters:
+    num_rays (int): Total number of rays.
+    chunk_size (int): Rays per chunk.
+    size (float): Scale of the shape the rays aim at.
+    radius (float): Radius of the sphere the rays start from.
+    rng (numpy.random.Generator): Random generator.
+    sampler (callable): Optional f(count, start) placing the origins, see montecarlo.make_sampler.
+
+    Yields:
+    tuple: Origins and directions of the next chunk, each of shape (chunk, 3).
+    """
+    for start in range(0, num_rays, chunk_size):
+        count = min(chunk_size, num_rays - start)
+        unit_samples = None if sampler is None else sampler(count, start)
+        origins, targets = sample_incoming_rays(count, size, rng, radius, unit_samples)
+        targets -= origins
+        yield origins, targets
+
+
+def reduce_chunk(bvh, statistics, origins, directions, max_bounces=1, energy_threshold=1e-6, reflectivity=None):
+    """
+    Intersect one chunk of rays and fold the outcome into `statistics`.
+
+    Rays are followed through up to `max_bounces` reflections; a ray leaves
+    the shape in the direction of its last traced reflection, and its radar
+    sits back along its launch direction. Rays left with less than
+    `energy_threshold` of their power are counted as dropped instead.
+    """
+    statistics.rays += len(origins)
+    radar_directions = -directions / np.linalg.norm(directions, axis=1, keepdims=True)
+
+    def depart(bounce):
+        dropped = np.abs(bounce.amplitude) ** 2 < energy_threshold
+        statistics.dropped += int(np.count_nonzero(dropped))
+        statistics.add_departures(Bounce(*(field[~dropped] for field in bounce)), radar_directions)
+
+    previous = None
+    for depth, bounce in enumerate(trace_bounces(bvh, origins, directions, max_bounces, energy_threshold, reflectivity)):
+        if depth == 0:
+            statistics.hits += len(bounce.rays)
+        statistics.add_bounce(bounce)
+        if previous is not None:
+            left = ~np.isin(previous.rays, bounce.rays, assume_unique=True)
+            depart(Bounce(*(field[left] for field in previous)))
+        previous = bounce
+    if previous is not None:
+        depart(previous)
+
+
+def stream_rays(bvh, num_rays, size, radius, rng=None, sampler=None, chunk_size=None,
+                memory_limit=DEFAULT_MEMORY_LIMIT, max_bounces=1, energy_threshold=1e-6, reflectivity=None,
+                direction_bins=(72, 36)):
+    """
+    Produce, intersect and reduce radar rays in fixed-size chunks.
+
+    Only the reductions in RayStatistics are kept between chunks, so memory
+    is bounded by the chunk size and the mesh, not by `num_rays`.
+
+    Parameters:
+    bvh (BVH): Hierarchy over the target mesh.
+    num_rays (int): Total number of rays.
+    size (float): Scale of the shape the rays aim at.
+    radius (float): Radius of the sphere the rays start from.
+    rng (numpy.random.Generator): Random generator, a fresh one if omitted.
+    sampler (callable): Optional origin sampler, see montecarlo.make_sampler.
+    chunk_size (int): Rays per chunk, derived from memory_limit if omitted.
+    memory_limit (int): Approximate ceiling in bytes on the per-chunk working memory.
+    max_bounces (int): Reflections followed per ray.
+    energy_threshold (float): Rays with less remaining energy are dropped.
+    reflectivity (callable): Optional reflection coefficient, see sbr.trace_bounces.
+    direction_bins (tuple): (azimuth, elevation) bins of the departure histogram.
+
+    Yields:
+    RayStatistics: The running reductions, after every chunk.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    chunk_size = chunk_size or chunk_size_for(memory_limit)
+    statistics = RayStatistics(bvh.num_triangles, direction_bins)
+    for origins, directions in ray_chunks(num_rays, chunk_size, size, radius, rng, sampler):
+        reduce_chunk(bvh, statistics, origins, directions, max_bounces, energy_threshold, reflectivity)
+        yield statistics